@@ -1,21 +1,50 @@
 # __init__.py (推荐的写法，无需修改)
+import time
+
+_import_started = time.perf_counter()
+
+# 节点模块只加载类定义和 INPUT_TYPES 所需的轻量依赖，zhipuai/oss2/PIL/numpy/torch 在节点首次执行时才导入
 from .node.glm import GLM_Text_Chat
 from .node.glm import GLM_Vision_ImageToPrompt
+from .node.glm import GLM_Batch_Text_Chat
 from .node.aliyun_oss_node import AliyunOSSDownloadNode
 from .node.aliyun_oss_node import AliyunOSSUploadNode
+from .node.aliyun_oss_node import AliyunOSSBulkUploadNode
+from .node.aliyun_oss_node import AliyunOSSBulkDownloadNode
+from .node.aliyun_oss_node import AliyunOSSImageUploadNode
 from .node.load_image import LoadImageNode
+from .node.metrics import metrics, register_metrics_routes
+from .node.glm_journal import register_journal_routes
+
+# 注册 /glm_prompt/metrics (Prometheus) 与 /glm_prompt/stats (JSON) 接口
+register_metrics_routes()
+# 注册 /glm_prompt/journal 任务日志查询接口
+register_journal_routes()
 
 NODE_CLASS_MAPPINGS = {
     "AliyunOSSUploadNode": AliyunOSSUploadNode,
     "AliyunOSSDownloadNode": AliyunOSSDownloadNode,
+    "AliyunOSSBulkUploadNode": AliyunOSSBulkUploadNode,
+    "AliyunOSSBulkDownloadNode": AliyunOSSBulkDownloadNode,
+    "AliyunOSSImageUploadNode": AliyunOSSImageUploadNode,
     "GLM_Text_Chat": GLM_Text_Chat,
     "GLM_Vision_ImageToPrompt": GLM_Vision_ImageToPrompt,
+    "GLM_Batch_Text_Chat": GLM_Batch_Text_Chat,
     "LoadImage": LoadImageNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "AliyunOSSUploadNode": "Aliyun OSS Upload",
     "AliyunOSSDownloadNode": "Aliyun OSS Download",
+    "AliyunOSSBulkUploadNode": "Aliyun OSS Bulk Upload",
+    "AliyunOSSBulkDownloadNode": "Aliyun OSS Bulk Download",
+    "AliyunOSSImageUploadNode": "Aliyun OSS Image Upload",
     "GLM_Text_Chat": "GLM提示词扩写",
     "GLM_Vision_ImageToPrompt": "GLM提示词反推",
+    "GLM_Batch_Text_Chat": "GLM批量扩写(Batch API)",
 }
+
+# 记录插件导入耗时，便于发现启动变慢的回归
+IMPORT_SECONDS = time.perf_counter() - _import_started
+metrics.observe("stage_seconds", IMPORT_SECONDS, stage="plugin_import")
+print(f"[GLM_Nodes] 信息：节点加载完成，耗时 {IMPORT_SECONDS * 1000:.1f} ms。")
@@ -0,0 +1,430 @@
+"""
+本地模拟服务：模拟智谱 GLM (chat/files/batches) 与阿里云 OSS 接口，用于离线基准测试。
+
+    python bench/mock_server.py --port 8765 --latency 0.2 --error-rate 0.05
+
+GLM 客户端 base_url 使用 http://127.0.0.1:8765/api/paas/v4，
+OSS endpoint 使用 http://127.0.0.1:8765 (本地地址时 oss2 使用 path-style 访问)。
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+GLM_PREFIX = "/api/paas/v4"
+
+# crc64 ecma：优先使用 oss2.utils.Crc64 (crcmod C 扩展)，纯 Python 实现约 0.25s/MB 且持有 GIL，会计入被测耗时
+try:
+    from oss2.utils import Crc64 as _Crc64
+except ImportError:
+    _Crc64 = None
+
+_CRC64_POLY = 0xC96C5795D7870F42
+_CRC64_TABLE = []
+for _i in range(256):
+    _crc = _i
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ _CRC64_POLY if _crc & 1 else _crc >> 1
+    _CRC64_TABLE.append(_crc)
+
+
+def crc64(data, crc=0):
+    if _Crc64 is not None:
+        checksum = _Crc64(crc)
+        checksum.update(data)
+        return checksum.crc
+    crc ^= 0xFFFFFFFFFFFFFFFF
+    table = _CRC64_TABLE
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFFFFFFFFFF
+
+
+class MockConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, tokens_per_second=0.0, bandwidth=0.0):
+        #: 每个请求的固定延迟 (秒)
+        self.latency = latency
+        #: 延迟的随机抖动上限 (秒)
+        self.jitter = jitter
+        #: 随机返回 429/500 的概率
+        self.error_rate = error_rate
+        #: GLM 模拟生成速度 (token/秒)，0 表示立即返回
+        self.tokens_per_second = tokens_per_second
+        #: OSS 传输带宽上限 (字节/秒)，0 表示不限制
+        self.bandwidth = bandwidth
+
+
+class MockState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}       # (bucket, key) -> (data, crc, etag, mtime)
+        self.uploads = {}       # upload_id -> {part_number: bytes}
+        self.files = {}         # file_id -> bytes
+        self.batches = {}       # batch_id -> dict
+        self.requests = 0
+
+
+def _oss_object_headers(data, crc, etag, mtime):
+    return {
+        "Content-Length": str(len(data)),
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "x-oss-hash-crc64ecma": str(crc),
+        "x-oss-object-type": "Normal",
+        "Content-Type": "application/octet-stream",
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+    state = MockState()
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- 通用工具 ----
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            return self._throttled_read(length)
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        return b""
+
+    def _throttled_read(self, length):
+        if not self.config.bandwidth:
+            return self.rfile.read(length)
+        chunks = []
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            time.sleep(len(chunk) / self.config.bandwidth)
+        return b"".join(chunks)
+
+    def _send(self, status, body=b"", headers=None, content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault("Content-Type", content_type)
+        headers.setdefault("Content-Length", str(len(body)))
+        headers.setdefault("x-oss-request-id", uuid.uuid4().hex)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        if self.config.bandwidth and len(body) > 64 * 1024:
+            for i in range(0, len(body), 64 * 1024):
+                chunk = body[i:i + 64 * 1024]
+                self.wfile.write(chunk)
+                time.sleep(len(chunk) / self.config.bandwidth)
+        else:
+            self.wfile.write(body)
+
+    def _json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False))
+
+    def _simulate(self):
+        """模拟网络延迟与随机错误，返回 True 表示已返回错误响应。"""
+        with self.state.lock:
+            self.state.requests += 1
+        delay = self.config.latency + random.uniform(0, self.config.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            self._body()
+            if random.random() < 0.5:
+                self._send(429, json.dumps({"error": {"code": "1302", "message": "mock rate limit"}}), {"Retry-After": "1"})
+            else:
+                self._send(500, json.dumps({"error": {"code": "500", "message": "mock server error"}}))
+            return True
+        return False
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        return unquote(parts.path), {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_HEAD(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        path, query = self._route()
+        if self._simulate():
+            return
+        try:
+            if path.startswith(GLM_PREFIX):
+                self._handle_glm(path[len(GLM_PREFIX):], query)
+            else:
+                self._handle_oss(path, query)
+        except BrokenPipeError:
+            pass
+
+    # ---- GLM ----
+    def _handle_glm(self, path, query):
+        if self.command == "POST" and path == "/chat/completions":
+            return self._chat(json.loads(self._body() or b"{}"))
+        if self.command == "POST" and path == "/files":
+            return self._upload_file()
+        if self.command == "GET" and path.startswith("/files/") and path.endswith("/content"):
+            file_id = path[len("/files/"):-len("/content")]
+            data = self.state.files.get(file_id)
+            if data is None:
+                return self._json(404, {"error": {"code": "404", "message": "file not found"}})
+            return self._send(200, data, content_type="application/octet-stream")
+        if self.command == "POST" and path == "/batches":
+            return self._create_batch(json.loads(self._body() or b"{}"))
+        if self.command == "GET" and path.startswith("/batches/"):
+            batch = self.state.batches.get(path[len("/batches/"):])
+            if batch is None:
+                return self._json(404, {"error": {"code": "404", "message": "batch not found"}})
+            return self._json(200, batch)
+        self._json(404, {"error": {"code": "404", "message": f"unknown path {path}"}})
+
+    @staticmethod
+    def _completion_text(messages):
+        user = messages[-1]["content"] if messages else ""
+        if isinstance(user, list):
+            text = " ".join(p.get("text", "") for p in user if p.get("type") == "text")
+            images = sum(1 for p in user if p.get("type") != "text")
+            return f"<|begin_of_box|>mock caption for {images} image(s), {len(text)} prompt chars, best quality<|end_of_box|>"
+        return f"<|begin_of_box|>mock expansion of: {user}<|end_of_box|>"
+
+    def _chat(self, request):
+        messages = request.get("messages") or []
+        text = self._completion_text(messages)
+        prompt_tokens = sum(len(json.dumps(m.get("content"), ensure_ascii=False)) for m in messages) // 2
+        completion_tokens = max(1, len(text) // 4)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = uuid.uuid4().hex
+        created = int(time.time())
+        model = request.get("model", "mock")
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+            for index, piece in enumerate(pieces):
+                if self.config.tokens_per_second:
+                    time.sleep(2 / self.config.tokens_per_second)
+                chunk = {"id": completion_id, "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}}]}
+                if index == len(pieces) - 1:
+                    chunk["choices"][0]["finish_reason"] = "stop"
+                    chunk["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        if self.config.tokens_per_second:
+            time.sleep(completion_tokens / self.config.tokens_per_second)
+        self._json(200, {
+            "id": completion_id, "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        })
+
+    def _upload_file(self):
+        body = self._body()
+        boundary = self.headers.get("Content-Type", "").split("boundary=")[-1].encode("latin-1")
+        data = b""
+        for part in body.split(b"--" + boundary):
+            if b'name="file"' in part:
+                data = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+        file_id = "file-" + uuid.uuid4().hex[:12]
+        self.state.files[file_id] = data
+        self._json(200, {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                         "filename": "input.jsonl", "purpose": "batch"})
+
+    def _create_batch(self, request):
+        input_data = self.state.files.get(request.get("input_file_id"), b"")
+        lines = []
+        for line in input_data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            text = self._completion_text(item["body"].get("messages") or [])
+            lines.append(json.dumps({
+                "custom_id": item["custom_id"],
+                "response": {"status_code": 200, "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}},
+            }, ensure_ascii=False))
+        output_id = "file-" + uuid.uuid4().hex[:12]
+        self.state.files[output_id] = ("\n".join(lines) + "\n").encode("utf-8")
+        batch_id = "batch-" + uuid.uuid4().hex[:12]
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"), "status": "completed",
+            "input_file_id": request.get("input_file_id"), "output_file_id": output_id, "error_file_id": None,
+            "created_at": int(time.time()), "completion_window": "24h",
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0},
+        }
+        self.state.batches[batch_id] = batch
+        self._json(200, batch)
+
+    # ---- OSS ----
+    def _xml(self, status, body, headers=None):
+        self._send(status, '<?xml version="1.0" encoding="UTF-8"?>\n' + body, headers, content_type="application/xml")
+
+    def _oss_error(self, status, code):
+        self._xml(status, f"<Error><Code>{code}</Code><Message>{code}</Message><RequestId>mock</RequestId></Error>")
+
+    def _handle_oss(self, path, query):
+        bucket, _, key = path.lstrip("/").partition("/")
+        state = self.state
+        if not key:
+            if "location" in query:
+                return self._xml(200, "<LocationConstraint>oss-cn-mock</LocationConstraint>")
+            return self._list_objects(bucket, query)
+        object_id = (bucket, key)
+        if self.command == "PUT" and "uploadId" in query:
+            data = self._body()
+            with state.lock:
+                state.uploads[query["uploadId"]][int(query["partNumber"])] = data
+            return self._send(200, headers={"ETag": f'"{hashlib.md5(data).hexdigest().upper()}"',
+                                            "x-oss-hash-crc64ecma": str(crc64(data))})
+        if self.command == "PUT":
+            return self._store(object_id, self._body())
+        if self.command == "POST" and "uploads" in query:
+            self._body()
+            upload_id = uuid.uuid4().hex
+            with state.lock:
+                state.uploads[upload_id] = {}
+            return self._xml(200, f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                                  f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+        if self.command == "POST" and "uploadId" in query:
+            self._body()
+            with state.lock:
+                parts = state.uploads.pop(query["uploadId"], {})
+            data = b"".join(parts[n] for n in sorted(parts))
+            self._store(object_id, data, respond=False)
+            _, crc, etag, _ = state.objects[object_id]
+            return self._xml(200, f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                                  f"<ETag>\"{etag}\"</ETag></CompleteMultipartUploadResult>",
+                             {"x-oss-hash-crc64ecma": str(crc)})
+        if self.command == "GET" and "uploadId" in query:
+            parts = state.uploads.get(query["uploadId"], {})
+            items = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+                f"<ETag>\"{hashlib.md5(d).hexdigest().upper()}\"</ETag><Size>{len(d)}</Size></Part>"
+                for n, d in sorted(parts.items()))
+            return self._xml(200, f"<ListPartsResult><IsTruncated>false</IsTruncated><NextPartNumberMarker>0</NextPartNumberMarker>{items}</ListPartsResult>")
+        if self.command == "DELETE":
+            with state.lock:
+                state.uploads.pop(query.get("uploadId"), None)
+                state.objects.pop(object_id, None)
+            return self._send(204)
+        entry = state.objects.get(object_id)
+        if entry is None:
+            return self._oss_error(404, "NoSuchKey")
+        data, crc, etag, mtime = entry
+        headers = _oss_object_headers(data, crc, etag, mtime)
+        if self.command == "HEAD":
+            self.send_response(200)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("x-oss-request-id", uuid.uuid4().hex)
+            self.end_headers()
+            return
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            start, _, end = range_header[len("bytes="):].partition("-")
+            start = int(start or 0)
+            end = min(int(end) if end else len(data) - 1, len(data) - 1)
+            body = data[start:end + 1]
+            headers["Content-Length"] = str(len(body))
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            headers.pop("x-oss-hash-crc64ecma")
+            return self._send(206, body, headers)
+        self._send(200, data, headers)
+
+    def _store(self, object_id, data, respond=True):
+        crc = crc64(data)
+        etag = hashlib.md5(data).hexdigest().upper()
+        with self.state.lock:
+            self.state.objects[object_id] = (data, crc, etag, time.time())
+        if respond:
+            self._send(200, headers={"ETag": f'"{etag}"', "x-oss-hash-crc64ecma": str(crc)})
+
+    def _list_objects(self, bucket, query):
+        prefix = query.get("prefix", "")
+        max_keys = int(query.get("max-keys") or 100)
+        token = query.get("continuation-token", "")
+        keys = sorted(k for b, k in self.state.objects if b == bucket and k.startswith(prefix) and k > token)
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+        contents = []
+        for key in page:
+            data, _, etag, mtime = self.state.objects[(bucket, key)]
+            modified = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(mtime))
+            contents.append(f"<Contents><Key>{escape(key)}</Key><LastModified>{modified}</LastModified>"
+                            f"<ETag>\"{etag}\"</ETag><Type>Normal</Type><Size>{len(data)}</Size>"
+                            f"<StorageClass>Standard</StorageClass></Contents>")
+        next_token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+        self._xml(200, f"<ListBucketResult><Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+                       f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                       f"{next_token}{''.join(contents)}</ListBucketResult>")
+
+
+def start_mock_server(port=0, config=None):
+    """在后台线程启动模拟服务，返回 (server, base_url)。"""
+    handler = type("BoundMockHandler", (MockHandler,), {"config": config or MockConfig(), "state": MockState()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MockServer", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GLM / OSS 本地模拟服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="字节/秒")
+    args = parser.parse_args()
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.tokens_per_second, args.bandwidth)
+    server, base_url = start_mock_server(args.port, config)
+    print(f"mock server listening on {base_url} (GLM base_url: {base_url}{GLM_PREFIX})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
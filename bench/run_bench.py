@@ -0,0 +1,286 @@
+"""
+离线基准测试：启动本地模拟服务 (bench/mock_server.py)，通过节点类端到端测量吞吐量和延迟分位数。
+
+    python bench/run_bench.py
+    python bench/run_bench.py --suites text,vision --latency 0.3 --jitter 0.1 --error-rate 0.02
+    python bench/run_bench.py --json results.json
+
+每个场景输出：请求数、失败数、总耗时、吞吐 (次/秒) 以及 p50/p90/p99/max 延迟。
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+PACKAGE_NAME = "glm_prompt_bench"
+
+sys.path.insert(0, BENCH_DIR)
+from mock_server import GLM_PREFIX, MockConfig, start_mock_server  # noqa: E402
+
+SUITES = ("startup", "text", "vision", "batch", "oss")
+
+# 插件导入时不应加载的重依赖
+HEAVY_MODULES = ("zhipuai", "httpx", "oss2", "PIL", "numpy", "torch")
+
+_STARTUP_SNIPPET = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location({name!r}, {init!r}, submodule_search_locations=[{root!r}])
+package = importlib.util.module_from_spec(spec)
+sys.modules[{name!r}] = package
+spec.loader.exec_module(package)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def load_package():
+    """按包方式加载仓库 (节点模块使用相对导入)。"""
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_scenario(name, fn, requests, concurrency):
+    """并发执行 fn(i) 共 requests 次，返回统计结果。fn 抛出异常记为失败。"""
+    latencies = []
+    failures = 0
+
+    def _timed(i):
+        started = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    # 节点日志直接 print，测量期间屏蔽以免刷屏和影响计时
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(_timed, range(requests)):
+            if latency is None:
+                failures += 1
+            else:
+                latencies.append(latency)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "failures": failures,
+        "elapsed": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(latencies, 50), 4),
+        "p90": round(percentile(latencies, 90), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "max": round(latencies[-1], 4) if latencies else 0.0,
+    }
+    print(f"{name:<40} n={requests:<5} c={concurrency:<3} fail={failures:<4} "
+          f"{result['throughput']:>8.2f}/s  p50={result['p50']:.3f}s  p90={result['p90']:.3f}s  "
+          f"p99={result['p99']:.3f}s  max={result['max']:.3f}s")
+    return result
+
+
+def bench_startup(args):
+    """在全新子进程中测量插件导入耗时，并检查是否提前加载了重依赖。"""
+    snippet = _STARTUP_SNIPPET.format(name=PACKAGE_NAME, init=os.path.join(PACKAGE_DIR, "__init__.py"),
+                                      root=PACKAGE_DIR, heavy=HEAVY_MODULES)
+    samples = []
+    heavy = []
+    for _ in range(max(1, min(args.requests, 10))):
+        output = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        samples.append(report["elapsed"])
+        heavy = report["heavy"]
+    samples.sort()
+    result = {
+        "scenario": "startup/import",
+        "requests": len(samples),
+        "p50": round(percentile(samples, 50), 4),
+        "max": round(samples[-1], 4),
+        "heavy_modules": heavy,
+    }
+    print(f"{'startup/import':<40} n={len(samples):<5} p50={result['p50'] * 1000:.1f}ms  max={result['max'] * 1000:.1f}ms  "
+          f"eager heavy imports: {', '.join(heavy) or 'none'}")
+    return [result]
+
+
+def bench_text(package, args):
+    node = package.NODE_CLASS_MAPPINGS["GLM_Text_Chat"]()
+    results = []
+    for stream in (False, True):
+        for concurrency in args.concurrency:
+            def _call(i, stream=stream):
+                node.glm_chat_function(
+                    f"bench prompt {i}", args.api_key, "GLM-4.5-Flash", i + 1, 0.9, 0.7, 256,
+                    "你是提示词扩写助手。", "", cache_mode="跳过", stream=stream,
+                )
+            label = f"text/{'stream' if stream else 'sync'}"
+            results.append(run_scenario(label, _call, args.requests, concurrency))
+    return results
+
+
+def bench_vision(package, args):
+    node = package.NODE_CLASS_MAPPINGS["GLM_Vision_ImageToPrompt"]()
+    rng = np.random.default_rng(0)
+    results = []
+    for size in args.image_sizes:
+        for batch_size in args.batch_sizes:
+            images = rng.random((batch_size, size, size, 3), dtype=np.float32)
+
+            def _call(i, images=images, batch_size=batch_size):
+                node.generate_prompt(
+                    args.api_key, "describe", i + 1, "GLM-4v-flash", image_input=images,
+                    cache_mode="跳过", batch_mode=batch_size > 1, concurrency=args.concurrency[-1],
+                )
+            # 每次调用处理 batch_size 张图片，请求数按批次缩减以控制总耗时
+            requests = max(1, args.requests // batch_size)
+            results.append(run_scenario(f"vision/{size}px x{batch_size}", _call, requests, args.concurrency[0]))
+    return results
+
+
+def bench_batch(package, args):
+    node = package.NODE_CLASS_MAPPINGS["GLM_Batch_Text_Chat"]()
+    jobs_dir = os.path.join(os.path.dirname(package.node.glm.__file__), package.node.glm.BATCH_JOBS_DIR_NAME)
+    results = []
+    for batch_size in args.batch_sizes:
+        prompts = "\n".join(f"bench prompt {i}" for i in range(batch_size * 10))
+        job_names = []
+
+        def _call(i, prompts=prompts):
+            job_name = f"bench-{uuid.uuid4().hex[:8]}"
+            job_names.append(job_name)
+            texts, status = node.run_batch(job_name, "", "你是提示词扩写助手。", args.api_key, "GLM-4.5-Flash",
+                                           0.9, 0.7, 256, prompts, poll_interval=1.0)
+            if not texts:
+                raise RuntimeError(status)
+        try:
+            results.append(run_scenario(f"batch/{batch_size * 10} prompts", _call, max(1, args.requests // 10), 1))
+        finally:
+            for job_name in job_names:
+                shutil.rmtree(os.path.join(jobs_dir, job_name), ignore_errors=True)
+    return results
+
+
+def bench_oss(package, args, base_url, work_dir):
+    upload = package.NODE_CLASS_MAPPINGS["AliyunOSSUploadNode"]()
+    download = package.NODE_CLASS_MAPPINGS["AliyunOSSDownloadNode"]()
+    checkpoint_dir = os.path.join(work_dir, "checkpoints")
+    results = []
+    for size_mb in args.file_sizes:
+        local_file = os.path.join(work_dir, f"payload_{size_mb}mb.bin")
+        with open(local_file, "wb") as f:
+            f.write(os.urandom(int(size_mb * 1024 * 1024)))
+        requests = max(1, min(args.requests, int(64 / max(size_mb, 1))))
+
+        def _upload(i, local_file=local_file, size_mb=size_mb):
+            result = upload.upload_file("ak", "sk", base_url, "bench-bucket", local_file, f"bench/{size_mb}mb/{i}.bin",
+                                        checkpoint_dir=checkpoint_dir)[0]
+            if not result.startswith("https://"):
+                raise RuntimeError(result)
+
+        def _download(i, size_mb=size_mb):
+            local_path = os.path.join(work_dir, "download", f"{size_mb}mb_{i}.bin")
+            result = download.download_file("ak", "sk", base_url, "bench-bucket", f"bench/{size_mb}mb/{i}.bin",
+                                            local_path, use_cache=False)[0]
+            if result != local_path:
+                raise RuntimeError(result)
+
+        for concurrency in args.concurrency:
+            results.append(run_scenario(f"oss/upload {size_mb}MB", _upload, requests, concurrency))
+            results.append(run_scenario(f"oss/download {size_mb}MB", _download, requests, concurrency))
+    return results
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _float_list(value):
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GLM_Prompt 节点离线基准测试")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"逗号分隔，可选 {', '.join(SUITES)}")
+    parser.add_argument("--requests", type=int, default=40, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8], help="并发数列表，如 1,8,32")
+    parser.add_argument("--image-sizes", type=_int_list, default=[512, 1024, 2048])
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4])
+    parser.add_argument("--file-sizes", type=_float_list, default=[1, 16], help="OSS 文件大小 (MB)")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务固定延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务延迟抖动上限 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 429/500 的概率")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="模拟生成速度，0=立即返回")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="模拟 OSS 带宽 (字节/秒)，0=不限制")
+    parser.add_argument("--json", default="", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+    args.api_key = "bench.mock-key"
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.tokens_per_second, args.bandwidth)
+    server, base_url = start_mock_server(0, config)
+    os.environ["ZHIPUAI_BASE_URL"] = base_url + GLM_PREFIX
+    package = load_package()
+    # httpx/oss2 的逐请求日志会淹没结果输出
+    for name in ("httpx", "oss2"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    work_dir = tempfile.mkdtemp(prefix="glm_bench_")
+    results = []
+    try:
+        for suite in suites:
+            if suite == "startup":
+                results += bench_startup(args)
+            elif suite == "text":
+                results += bench_text(package, args)
+            elif suite == "vision":
+                results += bench_vision(package, args)
+            elif suite == "batch":
+                results += bench_batch(package, args)
+            elif suite == "oss":
+                results += bench_oss(package, args, base_url, work_dir)
+            else:
+                parser.error(f"未知场景: {suite}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        report = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "api_key")},
+            "results": results,
+            "metrics": package.node.metrics.get_metrics_snapshot(),
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,71 @@
 from pathlib import Path
-import oss2
-from oss2.credentials import EnvironmentVariableCredentialsProvider
 from itertools import islice
 import os
 import logging
 import time
 import random
+import threading
+import glob
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from .image_codec import IMAGE_FORMATS, encode_frame
+from .metrics import metrics
+
+# oss2 较重，只在节点首次执行时导入 (函数内 import oss2)；日志交给宿主配置，不修改根 logger
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 断点续传记录目录
+CHECKPOINT_DIR = os.path.join(CURRENT_DIR, '..', 'oss_checkpoints')
+# 下载缓存目录
+DOWNLOAD_CACHE_DIR = os.path.join(CURRENT_DIR, '..', 'oss_cache')
+# 下载缓存默认总大小上限 (GB)
+DEFAULT_CACHE_MAX_GB = 2.0
+# 每个缓存对象最多记录多少个输出路径的状态
+MAX_TRACKED_OUTPUTS = 16
+
+_bucket_lock = threading.Lock()
+_buckets = {}
+_bucket_locations = {}
+_session = None
+
+
+def get_bucket(access_key_id, access_key_secret, endpoint, bucket_name):
+    """
+    按 (凭证, endpoint, bucket) 复用 oss2.Bucket，所有 Bucket 共享同一个 HTTP 连接池。
+    """
+    import oss2
+    global _session
+    key = (access_key_id, access_key_secret, endpoint, bucket_name)
+    with _bucket_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            if _session is None:
+                _session = oss2.Session()
+            auth = oss2.Auth(access_key_id, access_key_secret)
+            bucket = oss2.Bucket(auth, endpoint, bucket_name, session=_session)
+            _buckets[key] = bucket
+        return bucket
+
+
+def get_bucket_location(bucket):
+    """获取 bucket 所在地域，结果按 (endpoint, bucket) 缓存，只请求一次。"""
+    key = (bucket.endpoint, bucket.bucket_name)
+    location = _bucket_locations.get(key)
+    if location is None:
+        location = bucket.get_bucket_location().location
+        with _bucket_lock:
+            _bucket_locations[key] = location
+    return location
+
+
+def clear_bucket_cache():
+    with _bucket_lock:
+        _buckets.clear()
+        _bucket_locations.clear()
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class AliyunOSSUploadNode:
     """
@@ -23,6 +81,13 @@ class AliyunOSSUploadNode:
                 "bucket_name": ("STRING", {"multiline": False}),
                 "local_file_path": ("STRING", {"multiline": False}),
                 "object_name": ("STRING", {"multiline": False}),  # 上传到OSS的路径，例如 "uploads/test.jpg"
+            },
+            "optional": {
+                # 超过阈值的文件使用并行分片上传，并记录断点，失败后重新执行会从中断处继续
+                "multipart_threshold_mb": ("INT", {"default": 100, "min": 1, "max": 102400}),
+                "part_size_mb": ("INT", {"default": 10, "min": 1, "max": 5120}),
+                "num_threads": ("INT", {"default": 4, "min": 1, "max": 64}),
+                "checkpoint_dir": ("STRING", {"multiline": False, "default": ""}),  # 留空使用插件目录下的 oss_checkpoints
             }
         }
 
@@ -31,22 +96,31 @@ class AliyunOSSUploadNode:
     FUNCTION = "upload_file"
     CATEGORY = "JFD/aliyun_oss"
 
-    def upload_file(self, access_key_id, access_key_secret, endpoint, bucket_name, local_file_path, object_name):
+    def upload_file(self, access_key_id, access_key_secret, endpoint, bucket_name, local_file_path, object_name,
+                    multipart_threshold_mb=100, part_size_mb=10, num_threads=4, checkpoint_dir=""):
+        import oss2
         try:
-            # 添加超时设置
-            auth = oss2.Auth(access_key_id, access_key_secret)
-            bucket = oss2.Bucket(auth, endpoint, bucket_name)
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
             
             # 验证本地文件
             if not os.path.exists(local_file_path):
                 return (f"Error: local file {local_file_path} not found",)
             
-            # 上传文件
-            bucket.put_object_from_file(object_name, local_file_path)
-            result = bucket.get_bucket_location()
+            # 上传文件：小文件单次上传，大文件并行分片 + 断点续传
+            store = oss2.ResumableStore(root=checkpoint_dir or CHECKPOINT_DIR, dir='upload')
+            with metrics.timer("oss_transfer", op="upload"):
+                oss2.resumable_upload(
+                    bucket, object_name, local_file_path,
+                    store=store,
+                    multipart_threshold=multipart_threshold_mb * 1024 * 1024,
+                    part_size=part_size_mb * 1024 * 1024,
+                    num_threads=num_threads,
+                )
+            metrics.incr("bytes_total", os.path.getsize(local_file_path), direction="oss_upload")
+            location = get_bucket_location(bucket)
             # https://oss-cn-shanghai.aliyuncs.com
             # 构建URLhttps://drawbookai.oss-cn-shanghai.aliyuncs.com/comfyui/1755572562.png
-            oss_url = f"https://{bucket_name}.{result.location}.aliyuncs.com/{object_name}"
+            oss_url = f"https://{bucket_name}.{location}.aliyuncs.com/{object_name}"
             return (oss_url,)
             
         except oss2.exceptions.RequestError as e:
@@ -57,6 +131,145 @@ class AliyunOSSUploadNode:
             return (f"Upload failed: {str(e)}",)
 
 
+class OSSDownloadCache:
+    """
+    共享的OSS下载缓存目录。
+    以 ETag/Last-Modified 判断缓存是否最新，命中时不再传输；大对象使用分片断点续传下载；
+    总大小超过上限时按最近访问时间淘汰。索引保存在 cache_dir/index.json，可被多个工作流共享。
+    索引同时记录复制到各输出路径时的大小和修改时间，输出文件未被改动时命中缓存不再复制。
+    """
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self, cache_dir=DOWNLOAD_CACHE_DIR, max_bytes=int(DEFAULT_CACHE_MAX_GB * 1024 ** 3)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, self.INDEX_FILE_NAME)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = self._index_path() + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path())
+
+    @staticmethod
+    def _cache_key(bucket, object_name):
+        return hashlib.sha1(f"{bucket.endpoint}|{bucket.bucket_name}|{object_name}".encode('utf-8')).hexdigest()
+
+    def fetch(self, bucket, object_name, local_save_path, multiget_threshold=100 * 1024 * 1024,
+              part_size=10 * 1024 * 1024, num_threads=4):
+        """确保 local_save_path 为OSS对象的最新内容，返回是否命中缓存。"""
+        import oss2
+        meta = bucket.head_object(object_name)
+        cache_key = self._cache_key(bucket, object_name)
+        cached_file = os.path.join(self.cache_dir, 'objects', cache_key)
+
+        with self._lock:
+            entry = self._load_index().get(cache_key)
+        hit = (
+            entry is not None
+            and entry.get('etag') == meta.etag
+            and entry.get('last_modified') == meta.last_modified
+            and os.path.exists(cached_file)
+            and os.path.getsize(cached_file) == meta.content_length
+            # 缓存文件写入后被改动过 (如旧版本硬链接出去的文件被就地修改) 则重新下载
+            and entry.get('mtime') == os.path.getmtime(cached_file)
+        )
+        metrics.incr("cache_lookups_total", cache="oss_download", result="hit" if hit else "miss")
+        if not hit:
+            store = oss2.ResumableDownloadStore(root=self.cache_dir, dir='download')
+            with metrics.timer("oss_transfer", op="download"):
+                oss2.resumable_download(
+                    bucket, object_name, cached_file,
+                    multiget_threshold=multiget_threshold,
+                    part_size=part_size,
+                    num_threads=num_threads,
+                    store=store,
+                )
+            metrics.incr("bytes_total", meta.content_length, direction="oss_download")
+
+        output_path = os.path.abspath(local_save_path)
+        recorded = (entry.get('outputs') or {}).get(output_path) if hit else None
+        if recorded is None or self._file_state(output_path) != recorded:
+            self._materialize(cached_file, local_save_path)
+
+        with self._lock:
+            index = self._load_index()
+            previous = index.get(cache_key) or {}
+            outputs = dict(previous.get('outputs') or {}) if hit else {}
+            outputs.pop(output_path, None)
+            outputs[output_path] = self._file_state(output_path)
+            while len(outputs) > MAX_TRACKED_OUTPUTS:
+                outputs.pop(next(iter(outputs)))
+            index[cache_key] = {
+                'object': object_name,
+                'etag': meta.etag,
+                'last_modified': meta.last_modified,
+                'size': meta.content_length,
+                'mtime': os.path.getmtime(cached_file),
+                'atime': time.time(),
+                'outputs': outputs,
+            }
+            self._evict(index, keep=cache_key)
+            self._save_index(index)
+        return hit
+
+    @staticmethod
+    def _file_state(path):
+        """返回 [大小, 修改时间(ns)]，文件不存在时返回 None。"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def _materialize(cached_file, local_save_path):
+        """将缓存文件复制到目标路径 (不使用硬链接，之后对输出文件的修改不会影响缓存)。"""
+        if os.path.exists(local_save_path):
+            # 旧版本留下的硬链接先断开，避免复制到自身
+            os.remove(local_save_path)
+        Path(local_save_path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached_file, local_save_path)
+
+    def _evict(self, index, keep=None):
+        total = sum(entry.get('size', 0) for entry in index.values())
+        for cache_key, entry in sorted(index.items(), key=lambda item: item[1].get('atime', 0)):
+            if total <= self.max_bytes:
+                break
+            if cache_key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, 'objects', cache_key))
+            except OSError:
+                pass
+            total -= entry.get('size', 0)
+            del index[cache_key]
+
+
+_download_caches = {}
+
+
+def get_download_cache(cache_dir=DOWNLOAD_CACHE_DIR, max_bytes=int(DEFAULT_CACHE_MAX_GB * 1024 ** 3)):
+    cache_dir = os.path.abspath(cache_dir)
+    with _bucket_lock:
+        cache = _download_caches.get(cache_dir)
+        if cache is None:
+            cache = _download_caches[cache_dir] = OSSDownloadCache(cache_dir, max_bytes)
+        cache.max_bytes = max_bytes
+        return cache
+
+
 class AliyunOSSDownloadNode:
     """
     从阿里云OSS下载文件到本地，并返回本地路径
@@ -71,6 +284,12 @@ class AliyunOSSDownloadNode:
                 "bucket_name": ("STRING", {"multiline": False}),
                 "oss_file_path": ("STRING", {"multiline": False}),
                 "local_save_path": ("STRING", {"multiline": False}),  # 保存到本地的路径
+            },
+            "optional": {
+                # 开启后通过共享缓存目录下载，对象未变化时不再重复传输 (会额外占用一份磁盘空间)
+                "use_cache": ("BOOLEAN", {"default": False, "tooltip": "通过本地缓存下载，对象未变化时不再重复传输；缓存会额外占用 cache_max_gb 以内的磁盘空间"}),
+                "cache_dir": ("STRING", {"multiline": False, "default": ""}),  # 留空使用插件目录下的 oss_cache
+                "cache_max_gb": ("FLOAT", {"default": DEFAULT_CACHE_MAX_GB, "min": 0.1, "max": 10240.0, "step": 0.1}),
             }
         }
 
@@ -79,21 +298,276 @@ class AliyunOSSDownloadNode:
     FUNCTION = "download_file"
     CATEGORY = "JFD/aliyun_oss"
 
-    def download_file(self, access_key_id, access_key_secret, endpoint, bucket_name, oss_file_path, local_save_path):
+    def download_file(self, access_key_id, access_key_secret, endpoint, bucket_name, oss_file_path, local_save_path,
+                      use_cache=False, cache_dir="", cache_max_gb=DEFAULT_CACHE_MAX_GB):
         try:
-            auth = oss2.Auth(access_key_id, access_key_secret)
-            bucket = oss2.Bucket(auth, endpoint, bucket_name)
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+
+            if use_cache:
+                cache = get_download_cache(cache_dir or DOWNLOAD_CACHE_DIR, int(cache_max_gb * 1024 ** 3))
+                hit = cache.fetch(bucket, oss_file_path, local_save_path)
+                logger.info(f"OSS download {'cache hit' if hit else 'fetched'}: {oss_file_path}")
+                return (str(local_save_path),)
 
             save_dir = Path(local_save_path).parent
             save_dir.mkdir(parents=True, exist_ok=True)
 
-            bucket.get_object_to_file(oss_file_path, local_save_path)
+            with metrics.timer("oss_transfer", op="download"):
+                bucket.get_object_to_file(oss_file_path, local_save_path)
+            metrics.incr("bytes_total", os.path.getsize(local_save_path), direction="oss_download")
 
             return (str(local_save_path),)
         except Exception as e:
             return (f"Download failed: {str(e)}",)
 
 
+def _local_crc64(local_path, chunk_size=1024 * 1024):
+    import oss2
+    crc = oss2.utils.Crc64(0)
+    with open(local_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            crc.update(chunk)
+    return crc.crc
+
+
+def _is_unchanged(bucket, object_name, local_path, remote_size=None):
+    """
+    比较本地文件与OSS对象是否一致：先比较大小，大小一致再比较 CRC64。
+    """
+    import oss2
+    if not os.path.exists(local_path):
+        return False
+    local_size = os.path.getsize(local_path)
+    if remote_size is not None and remote_size != local_size:
+        return False
+    try:
+        meta = bucket.head_object(object_name)
+    except oss2.exceptions.NotFound:
+        return False
+    if meta.content_length != local_size:
+        return False
+    server_crc = getattr(meta, 'server_crc', None)
+    if server_crc is None:
+        return False
+    return server_crc == _local_crc64(local_path)
+
+
+def _run_bounded(items, fn, max_workers):
+    """
+    用有界线程池执行 fn(item)，最多同时挂起 max_workers * 2 个任务，
+    items 可以是惰性迭代器 (例如分页列举结果)。返回按输入顺序的结果列表。
+    """
+    results = []
+    pending = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_workers * 2:
+                results.append(pending.pop(0).result())
+        for future in pending:
+            results.append(future.result())
+    return results
+
+
+class AliyunOSSBulkUploadNode:
+    """
+    批量并发上传本地目录 (glob 匹配) 到OSS前缀，跳过未变化的文件，返回JSON清单
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "access_key_id": ("STRING", {"multiline": False}),
+                "access_key_secret": ("STRING", {"multiline": False}),
+                "endpoint": ("STRING", {"multiline": False}),
+                "bucket_name": ("STRING", {"multiline": False}),
+                "local_dir": ("STRING", {"multiline": False}),
+                "pattern": ("STRING", {"multiline": False, "default": "**/*"}),  # 相对 local_dir 的 glob
+                "oss_prefix": ("STRING", {"multiline": False, "default": "uploads/"}),
+            },
+            "optional": {
+                "max_workers": ("INT", {"default": 8, "min": 1, "max": 64}),
+                "skip_unchanged": ("BOOLEAN", {"default": True}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("manifest", "oss_urls")
+    FUNCTION = "upload_dir"
+    CATEGORY = "JFD/aliyun_oss"
+
+    def upload_dir(self, access_key_id, access_key_secret, endpoint, bucket_name, local_dir, pattern, oss_prefix,
+                   max_workers=8, skip_unchanged=True):
+        import oss2
+        try:
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+            location = get_bucket_location(bucket)
+            root = Path(local_dir)
+            if not root.is_dir():
+                return (f"Error: local dir {local_dir} not found", "")
+
+            files = (Path(p) for p in glob.iglob(str(root / pattern), recursive=True) if os.path.isfile(p))
+            store = oss2.ResumableStore(root=CHECKPOINT_DIR, dir='upload')
+
+            def _upload(path):
+                object_name = oss_prefix + path.relative_to(root).as_posix()
+                entry = {
+                    "local": str(path),
+                    "object": object_name,
+                    "url": f"https://{bucket_name}.{location}.aliyuncs.com/{object_name}",
+                }
+                try:
+                    if skip_unchanged and _is_unchanged(bucket, object_name, str(path)):
+                        entry["status"] = "skipped"
+                    else:
+                        with metrics.timer("oss_transfer", op="upload"):
+                            oss2.resumable_upload(bucket, object_name, str(path), store=store, num_threads=1)
+                        metrics.incr("bytes_total", path.stat().st_size, direction="oss_upload")
+                        entry["status"] = "uploaded"
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                return entry
+
+            manifest = _run_bounded(files, _upload, max_workers)
+            failed = sum(1 for entry in manifest if entry["status"] == "failed")
+            logger.info(f"OSS bulk upload: {len(manifest)} files, {failed} failed")
+            urls = "\n".join(entry["url"] for entry in manifest if entry["status"] != "failed")
+            return (json.dumps(manifest, ensure_ascii=False), urls)
+        except Exception as e:
+            return (f"Bulk upload failed: {str(e)}", "")
+
+
+class AliyunOSSBulkDownloadNode:
+    """
+    分页列举OSS前缀下的对象并批量并发下载到本地目录，跳过未变化的文件，返回JSON清单
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "access_key_id": ("STRING", {"multiline": False}),
+                "access_key_secret": ("STRING", {"multiline": False}),
+                "endpoint": ("STRING", {"multiline": False}),
+                "bucket_name": ("STRING", {"multiline": False}),
+                "oss_prefix": ("STRING", {"multiline": False}),
+                "local_dir": ("STRING", {"multiline": False}),
+            },
+            "optional": {
+                "max_workers": ("INT", {"default": 8, "min": 1, "max": 64}),
+                "max_objects": ("INT", {"default": 0, "min": 0, "max": 1000000}),  # 0 = 不限制
+                "skip_unchanged": ("BOOLEAN", {"default": True}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("manifest", "local_files")
+    FUNCTION = "download_prefix"
+    CATEGORY = "JFD/aliyun_oss"
+
+    def download_prefix(self, access_key_id, access_key_secret, endpoint, bucket_name, oss_prefix, local_dir,
+                        max_workers=8, max_objects=0, skip_unchanged=True):
+        import oss2
+        try:
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+            root = Path(local_dir)
+
+            # 分页列举，边列举边下载
+            objects = (obj for obj in oss2.ObjectIteratorV2(bucket, prefix=oss_prefix, max_keys=1000) if not obj.key.endswith('/'))
+            if max_objects:
+                objects = islice(objects, max_objects)
+
+            def _download(obj):
+                local_path = root / obj.key[len(oss_prefix):].lstrip('/')
+                entry = {"object": obj.key, "local": str(local_path), "size": obj.size}
+                try:
+                    if skip_unchanged and _is_unchanged(bucket, obj.key, str(local_path), obj.size):
+                        entry["status"] = "skipped"
+                    else:
+                        local_path.parent.mkdir(parents=True, exist_ok=True)
+                        with metrics.timer("oss_transfer", op="download"):
+                            bucket.get_object_to_file(obj.key, str(local_path))
+                        metrics.incr("bytes_total", obj.size, direction="oss_download")
+                        entry["status"] = "downloaded"
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                return entry
+
+            manifest = _run_bounded(objects, _download, max_workers)
+            failed = sum(1 for entry in manifest if entry["status"] == "failed")
+            logger.info(f"OSS bulk download: {len(manifest)} objects, {failed} failed")
+            local_files = "\n".join(entry["local"] for entry in manifest if entry["status"] != "failed")
+            return (json.dumps(manifest, ensure_ascii=False), local_files)
+        except Exception as e:
+            return (f"Bulk download failed: {str(e)}", "")
+
+
+_IMAGE_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+class AliyunOSSImageUploadNode:
+    """
+    直接上传 IMAGE 张量到OSS：逐帧在内存中编码后 put_object，不落盘；
+    编码与上传流水线并行，返回URL
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "access_key_id": ("STRING", {"multiline": False}),
+                "access_key_secret": ("STRING", {"multiline": False}),
+                "endpoint": ("STRING", {"multiline": False}),
+                "bucket_name": ("STRING", {"multiline": False}),
+                "images": ("IMAGE",),
+                "object_prefix": ("STRING", {"multiline": False, "default": "comfyui/"}),
+                "filename_prefix": ("STRING", {"multiline": False, "default": "image"}),
+            },
+            "optional": {
+                "image_format": (IMAGE_FORMATS, {"default": "PNG"}),
+                "quality": ("INT", {"default": 95, "min": 1, "max": 100}),  # JPEG/WEBP 质量
+                "max_workers": ("INT", {"default": 4, "min": 1, "max": 64}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("oss_urls", "oss_url_list")
+    OUTPUT_IS_LIST = (False, True)
+    FUNCTION = "upload_images"
+    CATEGORY = "JFD/aliyun_oss"
+
+    def upload_images(self, access_key_id, access_key_secret, endpoint, bucket_name, images, object_prefix, filename_prefix,
+                      image_format="PNG", quality=95, max_workers=4):
+        try:
+            bucket = get_bucket(access_key_id, access_key_secret, endpoint, bucket_name)
+            location = get_bucket_location(bucket)
+            extension = _IMAGE_EXTENSIONS[image_format]
+            stamp = int(time.time() * 1000)
+
+            def _put(object_name, data, mime):
+                with metrics.timer("oss_transfer", op="upload"):
+                    bucket.put_object(object_name, data, headers={"Content-Type": mime})
+                metrics.incr("bytes_total", len(data), direction="oss_upload")
+                return f"https://{bucket_name}.{location}.aliyuncs.com/{object_name}"
+
+            # 主线程编码下一帧的同时，线程池上传已编码的帧
+            pending = []
+            urls = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(len(images)):
+                    with metrics.timer("image_encode", format=image_format):
+                        data, mime = encode_frame(images[i], image_format, quality)
+                    object_name = f"{object_prefix}{filename_prefix}_{stamp}_{i:05d}.{extension}"
+                    pending.append(executor.submit(_put, object_name, data, mime))
+                    if len(pending) >= max_workers * 2:
+                        urls.append(pending.pop(0).result())
+                urls.extend(future.result() for future in pending)
+            return ("\n".join(urls), urls)
+        except Exception as e:
+            message = f"Upload failed: {str(e)}"
+            return (message, [message])
+
+
 # # 节点注册
 # NODE_CLASS_MAPPINGS = {
 #     "AliyunOSSUploadNode": AliyunOSSUploadNode,
@@ -1,20 +1,40 @@
 import os
 import json
-import base64
 import random
-from zhipuai import ZhipuAI
-from PIL import Image
-import numpy as np
-import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .glm_client import get_glm_client
+from .glm_cache import CACHE_MODES, CACHE_MODE_ON, CACHE_MODE_BYPASS, cached_call, make_cache_key
+from .glm_journal import get_journal, journaled_call
+from .glm_engine import get_request_engine, configure_request_engine, estimate_request_tokens
+from .glm_tokens import CONTEXT_OVERFLOW_MODES, CONTEXT_OVERFLOW_WARN, estimate_tokens, fit_context
+from .image_codec import IMAGE_FORMATS, encode_frame_data_url
+from .image_ingest import ImageIngestError, ingest_base64_image, ingest_image_url
+from .image_hash import dhash, dedupe_frames, caption_namespace, get_caption_index
+from .glm_stream import stream_completion
+from .postprocess import get_postprocessor, parse_rules
+from .glm_batch import run_batch_job, iter_prompts_file
+from .glm_resilience import call_with_resilience, DEFAULT_MAX_RETRIES
+from .glm_keys import get_key_pool, call_with_failover
+from .metrics import metrics, record_usage
 
 # 全局配置文件加载
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE_NAME = './config.json'
+# config.json 中可选的执行引擎参数 (键名同环境变量，环境变量优先) -> (GLMRequestEngine 参数, 类型)
+ENGINE_CONFIG_KEYS = {
+    "GLM_MAX_IN_FLIGHT": ("max_in_flight", int),
+    "GLM_RPM": ("rpm", float),
+    "GLM_TPM": ("tpm", float),
+}
 
 # 提示词预设文件
 TEXT_PROMPTS_FILE_NAME = '../prompt/text_prompts.txt'
 IMAGE_PROMPTS_FILE_NAME = '../prompt/image_prompts.txt'
 
+# 批处理任务状态目录
+BATCH_JOBS_DIR_NAME = '../batch_jobs'
+
 #文本模型列表
 TEXT_MODL_LIST = [
     "GLM-4.5",
@@ -42,6 +62,17 @@ VISION_MODL_LIST = [
     "GLM-4.1v-thinking-flash",
     ]
 
+#视觉模型实际使用的图片长边上限 (超出部分会被服务端缩小，提前在本地缩小以减少编码和上传开销)
+VISION_MODEL_MAX_EDGE = {
+    "GLM-4v-plus-0111": 1120,
+    "GLM-4v-flash": 1120,
+}
+DEFAULT_VISION_MAX_EDGE = 2048
+
+POSTPROCESS_TOOLTIP = "输出清理规则，逗号分隔 (normalize=统一空白和标点，dedupe_tags=逗号分隔标签去重，可用 postprocess.register_rule 注册自定义规则)；推理段和box标记总会处理"
+MAX_PROMPT_TOKENS_TOOLTIP = "输出提示词的最大 token 数 (本地估算)，超出时尽量在标点处截断，0=不限制"
+JOURNAL_TOOLTIP = "任务日志：每次请求的结果追加记录到本地JSONL，中断后重新运行时跳过已完成的请求 (GLM_JOURNAL_FILE 指定路径)"
+
 SUPPORTED_TRANSLATION_LANGS = [
     'zh', 'en',
 ]
@@ -59,6 +90,78 @@ def _log_error(message):
     """统一的错误输出函数"""
     print(f"[GLM_Nodes] 错误：{message}")
 
+def _fail(message, fallback_text=""):
+    """失败时抛出异常；设置了备用文本时输出备用文本，绝不把错误信息当作提示词输出。"""
+    _log_error(message)
+    if fallback_text:
+        _log_warning("使用备用文本输出。")
+        return fallback_text
+    raise RuntimeError(message)
+
+def _timeout_kwargs(timeout):
+    return {"timeout": timeout} if timeout else {}
+
+def _log_retry(attempt, delay, error):
+    metrics.incr("retries_total")
+    _log_warning(f"请求失败，{delay:.1f} 秒后第 {attempt} 次重试: {error}")
+
+def _journaled(journal, request, send, cache_mode, **fields):
+    """
+    启用任务日志时先查日志中已完成的结果，否则调用 send 并记录结果或错误。
+    缓存模式为跳过/刷新时不查日志，只记录本次的新结果。
+    """
+    if journal is None:
+        return send()
+    lookup = cache_mode == CACHE_MODE_ON
+    text, resumed = journaled_call(journal, make_cache_key(request), send, refresh=not lookup, **fields)
+    if lookup:
+        metrics.incr("cache_lookups_total", cache="journal", result="hit" if resumed else "miss")
+    if resumed:
+        _log_info("从任务日志恢复结果，跳过请求。")
+    return text
+
+def _describe_image(image_data):
+    """日志中只记录图片URL，Base64 数据只记录类型和长度。"""
+    if image_data.startswith("data:"):
+        return f"{image_data.partition(';')[0][5:]} ({len(image_data)} chars)"
+    return image_data
+
+def _split_list(value):
+    """按逗号/换行拆分多值输入并去重，保持原有顺序。"""
+    items = [item.strip() for item in value.replace("\n", ",").split(",")] if value else []
+    return list(dict.fromkeys(item for item in items if item))
+
+def _call_glm(api_keys, models, send, max_retries, request_deadline):
+    """
+    在多个 API Key 和候选模型间完成一次请求，send(client, api_key, model, timeout) 返回输出文本。
+    只有一个 Key 和一个模型时 429 在本 Key 上退避重试；否则立即切换到下一个 Key/模型。
+    """
+    pool = get_key_pool(api_keys)
+    has_alternatives = len(pool) > 1 or len(models) > 1
+
+    def _attempt(api_key, model):
+        client = get_glm_client(api_key)
+        return call_with_resilience(lambda timeout: send(client, api_key, model, timeout), (model, api_key),
+                                    max_retries=max_retries, deadline=request_deadline, on_retry=_log_retry,
+                                    retry_rate_limited=not has_alternatives)
+
+    text, used_model = call_with_failover(pool, models, _attempt)
+    if used_model != models[0]:
+        metrics.incr("model_fallbacks_total", model=used_model)
+        _log_warning(f"模型 {models[0]} 不可用，已降级到 {used_model}。")
+    return text
+
+def _send_stream_preview(unique_id, text):
+    """将流式生成中的文本显示在节点上 (ComfyUI 内置的进度文本通道，非 ComfyUI 环境下忽略)。"""
+    try:
+        from server import PromptServer
+    except ImportError:
+        return
+    server = PromptServer.instance
+    if unique_id is None or not hasattr(server, "send_progress_text"):
+        return
+    server.send_progress_text(text, unique_id)
+
 def get_zhipuai_api_key():
     env_api_key = os.getenv("ZHIPUAI_API_KEY")
     if env_api_key:
@@ -87,6 +190,67 @@ def get_zhipuai_api_key():
         _log_error(f"读取config.json文件时发生错误: {e}")
         return ""
 
+def configure_engine_from_config():
+    """按 config.json 中的 GLM_RPM/GLM_TPM/GLM_MAX_IN_FLIGHT 重建共享请求引擎，未配置时保持默认。"""
+    config_path = os.path.join(CURRENT_DIR, CONFIG_FILE_NAME)
+    if not os.path.exists(config_path):
+        return False
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        settings = {param: cast(config[key]) for key, (param, cast) in ENGINE_CONFIG_KEYS.items()
+                    if key in config and not os.getenv(key)}
+    except (OSError, ValueError, TypeError) as e:
+        _log_error(f"读取 {CONFIG_FILE_NAME} 中的限流配置失败: {e}")
+        return False
+    if not settings:
+        return False
+    engine = get_request_engine()
+    options = dict(max_in_flight=engine.max_in_flight, rpm=engine.rpm, tpm=engine.tpm)
+    options.update(settings)
+    configure_request_engine(**options)
+    _log_info(f"从 {CONFIG_FILE_NAME} 读取请求限流配置: 并发 {options['max_in_flight']}, RPM {options['rpm']:g}, TPM {options['tpm']:g}。")
+    return True
+
+configure_engine_from_config()
+
+def get_zhipuai_api_keys(api_key_input=""):
+    """
+    解析 API Key 列表：节点输入 (逗号/换行分隔多个) > 环境变量 ZHIPUAI_API_KEYS > 单个 Key (环境变量/config.json)。
+    """
+    api_keys = _split_list(api_key_input)
+    if api_keys:
+        return api_keys
+    api_keys = _split_list(os.getenv("ZHIPUAI_API_KEYS", ""))
+    if api_keys:
+        _log_info(f"使用环境变量 ZHIPUAI_API_KEYS，共 {len(api_keys)} 个 Key。")
+        return api_keys
+    api_key = get_zhipuai_api_key()
+    return [api_key] if api_key else []
+
+def parse_batch_inputs(text):
+    """
+    解析批量输入：每行一条；以 { 或 " 开头的行按 JSONL 解析，
+    对象取 text/prompt/input/content 字段，字符串直接使用。
+    """
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] in '{"':
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError:
+                value = line
+            if isinstance(value, dict):
+                value = next((value[key] for key in ("text", "prompt", "input", "content") if value.get(key)), "")
+            line = str(value).strip()
+            if not line:
+                continue
+        items.append(line)
+    return items
+
 def load_prompts_from_txt(file_path, default_built_in_prompts):
     prompts = {}
     current_prompt_name = None
@@ -130,11 +294,59 @@ def load_prompts_from_txt(file_path, default_built_in_prompts):
         _log_error(f"读取提示词文件 '{os.path.basename(file_path)}' 失败: {e}。使用默认提示词。")
         return default_built_in_prompts 
 
+class PromptPresetStore:
+    """
+    提示词预设缓存：每个文件只解析一次，文件 mtime 或大小变化时才重新解析。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _signature(file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path, default_built_in_prompts):
+        signature = self._signature(file_path)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+        prompts = load_prompts_from_txt(file_path, default_built_in_prompts)
+        # 预先计算各预设的 token 数 (estimate_tokens 按文本缓存)，后续请求无需重复统计
+        for content in prompts.values():
+            estimate_tokens(content)
+        with self._lock:
+            self._entries[file_path] = (signature, prompts)
+        return prompts
+
+    def reload(self, file_path=None):
+        """清除缓存，下次访问时重新解析 (file_path 为空则清除全部)。"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_path, None)
+
+
+_preset_store = PromptPresetStore()
+
+
+def reload_prompt_presets(file_path=None):
+    _preset_store.reload(file_path)
+
+
 #GLM文本补全节点
 class GLM_Text_Chat:
     CATEGORY = "JFD/GLM_Prompt"
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("文本",)
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("文本", "文本列表", "批量报告")
+    OUTPUT_IS_LIST = (False, True, False)
     FUNCTION = "glm_chat_function"
 
     # 内置的默认系统提示词 (当TXT文件不存在或解析失败时作为备用)
@@ -162,7 +374,7 @@ class GLM_Text_Chat:
 
     @classmethod
     def get_text_prompts(cls):
-        return load_prompts_from_txt(
+        return _preset_store.get(
             os.path.join(CURRENT_DIR, TEXT_PROMPTS_FILE_NAME),
             cls._BUILT_IN_TEXT_PROMPTS
         )
@@ -177,40 +389,60 @@ class GLM_Text_Chat:
             "required": {
                 "text_system_prompt_preset": (prompt_keys, {"default": default_selection}),
                 "system_prompt_override": ("STRING", {"multiline": True, "default": "", "placeholder": "系统提示词 (最高优先级，留空则从预设加载)"}),
-                "api_key": ("STRING", {"default": "", "multiline": False, "placeholder": "可选：智谱AI API Key (留空则尝试从环境变量或config.json读取)"}),
+                "api_key": ("STRING", {"default": "", "multiline": False, "placeholder": "可选：智谱AI API Key，多个用逗号分隔 (留空则尝试从环境变量或config.json读取)"}),
                 "model_name": (TEXT_MODL_LIST, {"default": default_model, "tooltip": "选择大模型"}),
                 "temperature": ("FLOAT", {"default": 0.9, "min": 0.0, "max": 1.0, "step": 0.01}),
                 "top_p": ("FLOAT", {"default": 0.7, "min": 0.0, "max": 1.0, "step": 0.01}),
                 "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 4096}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "0=随机种子。"}),
                 "text_input": ("STRING", {"multiline": True, "default": "a girl。", "placeholder": "请输入需要扩写的视频提示词内容"}),
+            },
+            "optional": {
+                "cache_mode": (CACHE_MODES, {"default": CACHE_MODE_ON, "tooltip": "响应缓存：启用=命中则直接返回；跳过=不读不写；刷新=重新请求并覆盖缓存"}),
+                "stream": ("BOOLEAN", {"default": False, "tooltip": "流式输出，生成过程中实时推送文本到前端"}),
+                "first_token_timeout": ("FLOAT", {"default": 30.0, "min": 0.0, "max": 600.0, "step": 1.0, "tooltip": "流式模式等待首个token的超时(秒)，0=不限制"}),
+                "total_timeout": ("FLOAT", {"default": 300.0, "min": 0.0, "max": 3600.0, "step": 1.0, "tooltip": "流式模式整体超时(秒)，0=不限制"}),
+                "max_retries": ("INT", {"default": DEFAULT_MAX_RETRIES, "min": 0, "max": 10, "tooltip": "429/5xx/超时时的最大重试次数"}),
+                "request_deadline": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 3600.0, "step": 1.0, "tooltip": "单次请求(含重试)的截止时间(秒)，0=不限制"}),
+                "fallback_text": ("STRING", {"multiline": True, "default": "", "placeholder": "可选：调用失败时输出的备用文本 (留空则失败时报错中断)"}),
+                "fallback_models": ("STRING", {"default": "", "placeholder": "可选：备选模型，逗号分隔 (如 GLM-4.5-air,GLM-4-Flashx)，限流或熔断时依次降级"}),
+                "batch_mode": ("BOOLEAN", {"default": False, "tooltip": "开启后 text_input 每行 (或每行一个 JSONL 对象) 为一条输入，并发扩写后按顺序输出到'文本列表'"}),
+                "concurrency": ("INT", {"default": 8, "min": 1, "max": 64, "tooltip": "批量模式下的最大并发请求数"}),
+                "context_overflow": (CONTEXT_OVERFLOW_MODES, {"default": CONTEXT_OVERFLOW_WARN, "tooltip": "输入超出模型上下文窗口时：警告=原样发送；截断=截断用户输入。max_tokens 超出时总会自动压缩"}),
+                "journal": ("BOOLEAN", {"default": False, "tooltip": JOURNAL_TOOLTIP}),
+                "postprocess_rules": ("STRING", {"default": "", "placeholder": "可选：输出清理规则，如 normalize,dedupe_tags", "tooltip": POSTPROCESS_TOOLTIP}),
+                "max_prompt_tokens": ("INT", {"default": 0, "min": 0, "max": 4096, "tooltip": MAX_PROMPT_TOKENS_TOOLTIP}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
-    def glm_chat_function(self, text_input, api_key, model_name, seed, temperature, top_p, max_tokens, system_prompt_override, text_system_prompt_preset):
+    def glm_chat_function(self, text_input, api_key, model_name, seed, temperature, top_p, max_tokens, system_prompt_override, text_system_prompt_preset, cache_mode=CACHE_MODE_ON,
+                          stream=False, first_token_timeout=30.0, total_timeout=300.0, max_retries=DEFAULT_MAX_RETRIES, request_deadline=0.0, fallback_text="",
+                          fallback_models="", batch_mode=False, concurrency=8,
+                          context_overflow=CONTEXT_OVERFLOW_WARN, journal=False, postprocess_rules="", max_prompt_tokens=0,
+                          unique_id=None):
         
-        final_api_key = api_key.strip() or get_zhipuai_api_key()
-        if not final_api_key:
-            _log_error("API Key 未提供。")
-            return ("API Key 未提供。",)
-
-        _log_info("初始化智谱AI客户端。")
-
+        api_keys = get_zhipuai_api_keys(api_key)
+        if not api_keys:
+            return self._error("API Key 未提供。", fallback_text)
+        models = _split_list(",".join([model_name, fallback_models]))
         try:
-            client = ZhipuAI(api_key=final_api_key)
-        except Exception as e:
-            _log_error(f"客户端初始化失败: {e}")
-            return (f"客户端初始化失败: {e}",)
+            processor = get_postprocessor(parse_rules(postprocess_rules), max_prompt_tokens)
+        except ValueError as e:
+            return self._error(str(e), fallback_text)
 
         final_system_prompt = ""
-        available_prompts = self.get_text_prompts()
+        with metrics.timer("preset_load", node="GLM_Text_Chat"):
+            available_prompts = self.get_text_prompts()
 
         if system_prompt_override and system_prompt_override.strip():
             final_system_prompt = system_prompt_override.strip()
             _log_info("使用 'system_prompt_override'。")
         elif text_system_prompt_preset in available_prompts:
             final_system_prompt = available_prompts[text_system_prompt_preset]
-            _log_info(f"使用预设提示词: '{text_system_prompt_preset}'。")
+            _log_info(f"使用预设提示词: '{text_system_prompt_preset}' (约 {estimate_tokens(final_system_prompt)} tokens)。")
         else:
             if available_prompts:
                 final_system_prompt = list(available_prompts.values())[0]
@@ -221,8 +453,7 @@ class GLM_Text_Chat:
 
 
         if not final_system_prompt:
-            _log_error("系统提示词不能为空。")
-            return ("系统提示词不能为空。",)
+            return self._error("系统提示词不能为空。", fallback_text)
 
         if not isinstance(final_system_prompt, str):
             _log_warning(f"系统提示词类型异常: {type(final_system_prompt)}。尝试转换为字符串。")
@@ -231,40 +462,155 @@ class GLM_Text_Chat:
         effective_seed = seed if seed != 0 else random.randint(0, 0xffffffffffffffff)
         random.seed(effective_seed)
 
-        messages = [
-            {"role": "system", "content": final_system_prompt},
-            {"role": "user", "content": text_input}
-        ]
-        _log_info(f"调用 GLM-4 ({model_name})...")
+        job_journal = get_journal() if journal else None
+
+        def _expand(user_text, stream):
+            """发送一次扩写请求 (经过响应缓存、Key/模型切换和重试)，返回解析后的文本。"""
+            # 系统提示词固定放在最前且内容不变，服务端的上下文缓存可以复用这段前缀 (命中部分计入 cached_tokens)
+            messages = [
+                {"role": "system", "content": final_system_prompt},
+                {"role": "user", "content": user_text}
+            ]
+            messages, request_max_tokens, _, warning = fit_context(messages, max_tokens, models, context_overflow)
+            if warning:
+                _log_warning(warning)
+
+            def _send(client, api_key, model, timeout):
+                if stream:
+                    with metrics.timer("api_call", model=model, stream=True):
+                        result = get_request_engine().call(
+                            api_key,
+                            lambda: stream_completion(
+                                lambda: client.chat.completions.create(
+                                    model=model,
+                                    messages=messages,
+                                    temperature=temperature,
+                                    top_p=top_p,
+                                    max_tokens=request_max_tokens,
+                                    stream=True,
+                                    **_timeout_kwargs(timeout),
+                                ),
+                                on_preview=lambda text: _send_stream_preview(unique_id, text),
+                                first_token_timeout=first_token_timeout,
+                                total_timeout=min(total_timeout, timeout) if timeout and total_timeout else (timeout or total_timeout),
+                                processor=processor,
+                            ),
+                            tokens=estimate_request_tokens(messages, request_max_tokens),
+                            timeout=timeout,
+                        )
+                    record_usage(result.usage, model)
+                    return result.text
+
+                with metrics.timer("api_call", model=model):
+                    response = get_request_engine().call(
+                        api_key,
+                        lambda: client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature,
+                            top_p=top_p,
+                            max_tokens=request_max_tokens,
+                            **_timeout_kwargs(timeout),
+                        ),
+                        tokens=estimate_request_tokens(messages, request_max_tokens),
+                        timeout=timeout,
+                    )
+                record_usage(getattr(response, "usage", None), model)
+                # 缓存/日志中保存原始文本，推理段和 box 标记由 PostProcessor 在输出前统一处理
+                return str(response.choices[0].message.content)
+
+            def _request():
+                return _journaled(job_journal, cache_request, lambda: _call_glm(api_keys, models, _send, max_retries, request_deadline),
+                                  cache_mode, node="GLM_Text_Chat", model=model_name, input=user_text)
+
+            cache_request = {
+                "model": model_name, "messages": messages, "temperature": temperature,
+                "top_p": top_p, "max_tokens": request_max_tokens, "seed": seed,
+            }
+            response_text, cache_hit = cached_call(cache_request, _request, cache_mode)
+            metrics.incr("cache_lookups_total", cache="response", result="hit" if cache_hit else "miss")
+            if cache_hit:
+                _log_info("命中响应缓存。")
+            return response_text
 
+        if batch_mode:
+            return self._run_batch(parse_batch_inputs(text_input), _expand, model_name, concurrency, fallback_text, processor)
+
+        _log_info(f"调用 GLM-4 ({model_name})...")
         try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                temperature=temperature,
-                top_p=top_p,
-                max_tokens=max_tokens,
-            )
-            # response_text = response.choices[0].message.content
-            # _log_info("GLM-4 响应成功。")
-            # return (response_text,)
-            response_text = str(response.choices[0].message.content)
-            if "<|begin_of_box|>" in response_text and "<|end_of_box|>" in response_text:
-                start = response_text.find("<|begin_of_box|>") + len("<|begin_of_box|>")
-                end = response_text.find("<|end_of_box|>")
-                response_text = response_text[start:end].strip()
+            response_text = processor.process(_expand(text_input, stream))
+            metrics.incr("requests_total", node="GLM_Text_Chat", status="ok")
             _log_info(f"GLM_vsion响应成功。({response_text})...")
-            return (response_text,)
+            return (response_text, [response_text], "")
         except Exception as e:
-            error_message = f"GLM-4 API 调用失败: {e}"
-            return (error_message,)
+            metrics.incr("requests_total", node="GLM_Text_Chat", status="error")
+            return self._error(f"GLM-4 API 调用失败: {e}", fallback_text)
+
+    @staticmethod
+    def _run_batch(items, expand, model_name, concurrency, fallback_text, processor):
+        """
+        批量扩写：相同输入只请求一次，按 concurrency 并发，结果按输入顺序输出。
+        设置了备用文本时失败条目输出备用文本，详情写入批量报告；未设置时有条目失败则整体报错。
+        """
+        if not items:
+            return GLM_Text_Chat._error("批量模式下没有有效的输入。", fallback_text)
+        unique_items = list(dict.fromkeys(items))
+        _log_info(f"批量调用 GLM-4 ({model_name})，共 {len(items)} 条 (去重后 {len(unique_items)} 条)，并发 {concurrency}...")
+
+        def _expand_one(item):
+            try:
+                text = expand(item, False)
+            except Exception as e:
+                metrics.incr("requests_total", node="GLM_Text_Chat", status="error")
+                _log_error(f"批量条目失败: {e}")
+                return None, str(e)
+            metrics.incr("requests_total", node="GLM_Text_Chat", status="ok")
+            return text, None
+
+        # executor.map 保证结果顺序与去重后的输入一致
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique_items)))) as executor:
+            outcomes = dict(zip(unique_items, executor.map(_expand_one, unique_items)))
+        succeeded_items = [item for item, (_, error) in outcomes.items() if error is None]
+        for item, text in zip(succeeded_items, processor.process_many([outcomes[item][0] for item in succeeded_items])):
+            outcomes[item] = (text, None)
+
+        results = []
+        report_items = []
+        for index, item in enumerate(items):
+            text, error = outcomes[item]
+            entry = {"index": index, "input": item, "status": "ok" if error is None else "failed"}
+            if error is not None:
+                entry["error"] = error
+                text = fallback_text
+            results.append(text)
+            report_items.append(entry)
+        failed = sum(1 for entry in report_items if entry["status"] == "failed")
+        report = {
+            "total": len(items),
+            "unique": len(unique_items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "items": report_items,
+        }
+        _log_info(f"GLM 批量扩写完成，成功 {len(items) - failed} 条，失败 {failed} 条。")
+        if failed and not fallback_text:
+            # 与单条模式一致：没有备用文本时不能把失败条目当作空提示词输出
+            failed_report = dict(report, items=[entry for entry in report_items if entry["status"] == "failed"])
+            _fail(f"批量扩写有 {failed} 条失败: {json.dumps(failed_report, ensure_ascii=False)}")
+        return ("\n".join(results), results, json.dumps(report, ensure_ascii=False))
+
+    @staticmethod
+    def _error(message, fallback_text=""):
+        text = _fail(message, fallback_text)
+        return (text, [text], "")
 
 
 # GLM提示词反推节点
 class GLM_Vision_ImageToPrompt:
     CATEGORY = "JFD/GLM_Prompt"
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("文本",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("文本", "文本列表")
+    OUTPUT_IS_LIST = (False, True)
     FUNCTION = "generate_prompt"
 
     _BUILT_IN_IMAGE_PROMPTS = {
@@ -274,7 +620,7 @@ class GLM_Vision_ImageToPrompt:
     @classmethod
     def get_image_prompts(cls):
         """加载外部或内置的图像提示词字典。"""
-        return load_prompts_from_txt(
+        return _preset_store.get(
             os.path.join(CURRENT_DIR, IMAGE_PROMPTS_FILE_NAME),
             cls._BUILT_IN_IMAGE_PROMPTS
         )
@@ -291,79 +637,58 @@ class GLM_Vision_ImageToPrompt:
                 "image_prompt_preset": (prompt_keys, {"default": default_selection}),
                 "prompt_override": ("STRING", {"default": "", "multiline": True, "placeholder": "请输入用于描述图片的文本提示词 (最高优先级，留空则从上方预设加载)"}),
                 "model_name": (VISION_MODL_LIST, {"default": default_model, "tooltip": "选择大模型"}),
-                "api_key": ("STRING", {"multiline": False, "default": "", "placeholder": "可选：智谱AI API Key (留空则尝试从环境变量或config.json读取)"}),
+                "api_key": ("STRING", {"multiline": False, "default": "", "placeholder": "可选：智谱AI API Key，多个用逗号分隔 (留空则尝试从环境变量或config.json读取)"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "0=随机种子。"}),
             },
             "optional": {
                 "image_url": ("STRING", {"default": "", "placeholder": "请输入图片URL (与Base64/IMAGE三选一)"}),
                 "image_input": ("IMAGE", {"optional": True, "tooltip": "直接输入ComfyUI IMAGE对象 (与URL/Base64三选一)"}),
+                "cache_mode": (CACHE_MODES, {"default": CACHE_MODE_ON, "tooltip": "响应缓存：启用=命中则直接返回；跳过=不读不写；刷新=重新请求并覆盖缓存"}),
+                "batch_mode": ("BOOLEAN", {"default": False, "tooltip": "开启后对IMAGE批次中的每张图片分别反推，结果按顺序输出到'文本列表'"}),
+                "concurrency": ("INT", {"default": 4, "min": 1, "max": 32, "tooltip": "批量模式下的最大并发请求数"}),
+                "image_format": (IMAGE_FORMATS, {"default": "JPEG", "tooltip": "IMAGE对象上传前的编码格式"}),
+                "image_quality": ("INT", {"default": 90, "min": 1, "max": 100, "tooltip": "JPEG/WEBP 编码质量"}),
+                "max_image_edge": ("INT", {"default": 0, "min": 0, "max": 8192, "tooltip": "上传前将图片长边缩小到该值，0=按模型自动选择"}),
+                "max_retries": ("INT", {"default": DEFAULT_MAX_RETRIES, "min": 0, "max": 10, "tooltip": "429/5xx/超时时的最大重试次数"}),
+                "request_deadline": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 3600.0, "step": 1.0, "tooltip": "单次请求(含重试)的截止时间(秒)，0=不限制"}),
+                "fallback_text": ("STRING", {"multiline": True, "default": "", "placeholder": "可选：调用失败时输出的备用文本 (留空则失败时报错中断)"}),
+                "fallback_models": ("STRING", {"default": "", "placeholder": "可选：备选模型，逗号分隔 (如 GLM-4.1v-thinking-flash)，限流或熔断时依次降级"}),
+                "dedup": ("BOOLEAN", {"default": False, "tooltip": "感知哈希去重：相似的帧 (含以往运行中描述过的图片) 直接复用已有描述，不再调用接口"}),
+                "dedup_distance": ("INT", {"default": 4, "min": 0, "max": 32, "tooltip": "视为相同图片的最大汉明距离 (64位dHash)，0=几乎完全相同"}),
+                "fetch_image_url": ("BOOLEAN", {"default": False, "tooltip": "在本地下载URL图片 (带缓存)，超出模型分辨率时缩小重新编码后以Base64发送"}),
+                "max_download_mb": ("INT", {"default": 20, "min": 1, "max": 200, "tooltip": "URL/Base64 图片的大小上限 (MB)，下载超出时立即中止"}),
+                "journal": ("BOOLEAN", {"default": False, "tooltip": JOURNAL_TOOLTIP}),
+                "postprocess_rules": ("STRING", {"default": "", "placeholder": "可选：输出清理规则，如 normalize,dedupe_tags", "tooltip": POSTPROCESS_TOOLTIP}),
+                "max_prompt_tokens": ("INT", {"default": 0, "min": 0, "max": 4096, "tooltip": MAX_PROMPT_TOKENS_TOOLTIP}),
             }
         }
-    def generate_prompt(self, api_key, prompt_override, seed, model_name, image_url="", image_base64="", image_prompt_preset="", image_input=None):
-        final_api_key = api_key.strip() or get_zhipuai_api_key()
-        if not final_api_key:
-            _log_error("API Key 未提供。")
-            return ("API Key 未提供。",)
-        
-        _log_info("初始化GLM...")
+    def generate_prompt(self, api_key, prompt_override, seed, model_name, image_url="", image_base64="", image_prompt_preset="", image_input=None, cache_mode=CACHE_MODE_ON, batch_mode=False, concurrency=4,
+                        image_format="JPEG", image_quality=90, max_image_edge=0, max_retries=DEFAULT_MAX_RETRIES, request_deadline=0.0, fallback_text="",
+                        fallback_models="", dedup=False, dedup_distance=4, fetch_image_url=False, max_download_mb=20, journal=False,
+                        postprocess_rules="", max_prompt_tokens=0):
+        api_keys = get_zhipuai_api_keys(api_key)
+        if not api_keys:
+            return self._error("API Key 未提供。", fallback_text)
+        models = _split_list(",".join([model_name, fallback_models]))
         try:
-            client = ZhipuAI(api_key=final_api_key)
-        except Exception as e:
-            _log_error(f"客户端初始化失败: {e}")
-            return (f"客户端初始化失败: {e}",)
+            processor = get_postprocessor(parse_rules(postprocess_rules), max_prompt_tokens)
+        except ValueError as e:
+            return self._error(str(e), fallback_text)
 
         image_url_provided = bool(image_url and image_url.strip())
         image_base64_provided = bool(image_base64 and image_base64.strip())
         image_input_provided = image_input is not None
 
         if not (image_url_provided or image_base64_provided or image_input_provided):
-            _log_error("必须提供图片URL、Base64数据或IMAGE对象。")
-            return ("必须提供图片URL、Base64数据或IMAGE对象。",)
+            return self._error("必须提供图片URL、Base64数据或IMAGE对象。", fallback_text)
             
         effective_seed = seed if seed != 0 else random.randint(0, 0xffffffffffffffff)
         random.seed(effective_seed)
 
-        #处理图片输入优先级：IMAGE > Base64 > URL
-        final_image_data = None
-        if image_input_provided:
-            _log_info("检测到 IMAGE 对象输入，正在转换为 Base64。")
-            try:
-                # ComfyUI的IMAGE是PyTorch张量，范围[0,1]，形状[B, H, W, C]
-                # 转换为PIL Image，范围[0,255]，形状[H, W, C]
-                i = 255. * image_input.cpu().numpy()
-                img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8)[0]) # 取第一个batch的图片
-                
-                buffered = io.BytesIO()
-                img.save(buffered, format="PNG") # 通常PNG是无损且支持透明度
-                final_image_data = "data:image/png;base64," + base64.b64encode(buffered.getvalue()).decode('utf-8')
-                _log_info("IMAGE 对象成功转换为 Base64。")
-            except Exception as e:
-                _log_error(f"将 IMAGE 对象转换为 Base64 失败: {e}")
-                return (f"将 IMAGE 对象转换为 Base64 失败: {e}",)
-        elif image_base64_provided:
-            _log_info("检测到 Base64 字符串输入。")
-            if image_base64.startswith("data:image/"):
-                final_image_data = image_base64
-            else:
-                _log_warning("Base64字符串缺少前缀，尝试添加默认JPEG前缀。")
-                try:
-                    # 尝试解码验证有效性，并添加常见前缀
-                    base64.b64decode(image_base64.split(',')[-1])
-                    final_image_data = f"data:image/jpeg;base64,{image_base64}"
-                except Exception as decode_e:
-                    _log_error(f"Base64解码失败: {decode_e}")
-                    return ("提供的Base64图片数据无效。",)
-        elif image_url_provided:
-            _log_info(f"检测到图片URL输入: {image_url}")
-            final_image_data = image_url
-
-        if not final_image_data:
-            _log_error("未能获取有效的图片数据。")
-            return ("未能获取有效的图片数据。",)
-
         #识图提示词确定优先级
         final_prompt_text = ""
-        available_prompts = self.get_image_prompts()
+        with metrics.timer("preset_load", node="GLM_Vision_ImageToPrompt"):
+            available_prompts = self.get_image_prompts()
 
         if prompt_override and prompt_override.strip():
             final_prompt_text = prompt_override.strip()
@@ -381,34 +706,281 @@ class GLM_Vision_ImageToPrompt:
 
 
         if not final_prompt_text:
-            _log_error("识图提示词不能为空。")
-            return ("识图提示词不能为空。",)
+            return self._error("识图提示词不能为空。", fallback_text)
         if not isinstance(final_prompt_text, str):
             _log_warning(f"识图提示词类型异常: {type(final_prompt_text)}。尝试转换为字符串。")
             final_prompt_text = str(final_prompt_text)
 
-        # 构建消息内容
-        content_parts = [{"type": "text", "text": final_prompt_text}]
-        content_parts.append({"type": "image_url", "image_url": {"url": final_image_data}})
+        #处理图片输入优先级：IMAGE > Base64 > URL
+        max_edge = max_image_edge or VISION_MODEL_MAX_EDGE.get(model_name, DEFAULT_VISION_MAX_EDGE)
+        final_image_data = None
+        image_data_list = []
+        # 去重模式：frame_sources[i] 为第 i 帧复用描述的代表帧，frame_captions[i] 为索引中已有的描述
+        frame_sources = None
+        frame_captions = None
+        if image_input_provided:
+            _log_info("检测到 IMAGE 对象输入，正在转换为 Base64。")
+            try:
+                # ComfyUI的IMAGE是PyTorch张量，范围[0,1]，形状[B, H, W, C]
+                # 非批量模式只取第一个batch的图片
+                frames = image_input if batch_mode else image_input[:1]
+                frame_list = [frames[i] for i in range(len(frames))]
+                frame_indices = list(range(len(frame_list)))
+
+                if dedup:
+                    caption_index = get_caption_index()
+                    caption_ns = caption_namespace(model_name, final_prompt_text)
+                    with metrics.timer("image_hash"):
+                        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(frame_list)))) as executor:
+                            frame_hashes = list(executor.map(dhash, frame_list))
+                    # 持久化索引遵循 cache_mode：只有启用时读取以往的描述，跳过/刷新时只在本批次内去重
+                    index_lookup = None
+                    if cache_mode == CACHE_MODE_ON:
+                        index_lookup = lambda value: caption_index.lookup(caption_ns, value, dedup_distance)
+                    frame_sources, frame_captions = dedupe_frames(frame_hashes, dedup_distance, index_lookup)
+                    # 只有未命中索引的代表帧需要编码和调用接口
+                    frame_indices = [i for i in frame_indices if frame_sources[i] == i and frame_captions[i] is None]
+                    metrics.incr("dedup_frames_total", len(frame_list) - len(frame_indices), result="reused")
+                    metrics.incr("dedup_frames_total", len(frame_indices), result="captioned")
+                    _log_info(f"感知哈希去重：共 {len(frame_list)} 张，需调用接口 {len(frame_indices)} 张。")
+
+                def _encode(frame):
+                    return encode_frame_data_url(frame, image_format, image_quality, max_edge)
+
+                with metrics.timer("image_encode", format=image_format):
+                    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(frame_indices) or 1))) as executor:
+                        encoded = list(executor.map(_encode, [frame_list[i] for i in frame_indices]))
+                image_data_list = [data_url for data_url, _ in encoded]
+                final_image_data = image_data_list[0] if image_data_list else None
+                payload_bytes = sum(size for _, size in encoded)
+                metrics.incr("bytes_total", payload_bytes, direction="image_payload")
+                payload_kb = payload_bytes / 1024
+                _log_info(f"IMAGE 对象成功转换为 Base64，共 {len(image_data_list)} 张，{image_format} 编码后 {payload_kb:.1f} KB。")
+            except Exception as e:
+                return self._error(f"将 IMAGE 对象转换为 Base64 失败: {e}", fallback_text)
+        elif image_base64_provided:
+            _log_info("检测到 Base64 字符串输入。")
+            try:
+                with metrics.timer("image_ingest", source="base64"):
+                    final_image_data, payload_bytes, reencoded = ingest_base64_image(
+                        image_base64, max_edge, image_format, image_quality, max_download_mb * 1024 * 1024)
+            except ImageIngestError as e:
+                return self._error(f"提供的Base64图片数据无效: {e}", fallback_text)
+            except Exception as e:
+                return self._error(f"处理Base64图片失败: {e}", fallback_text)
+            metrics.incr("bytes_total", payload_bytes, direction="image_payload")
+            if reencoded:
+                _log_info(f"Base64 图片超过接口大小限制，已缩小重新编码为 {payload_bytes / 1024:.1f} KB。")
+        elif image_url_provided:
+            image_url = image_url.strip()
+            _log_info(f"检测到图片URL输入: {image_url}")
+            if fetch_image_url:
+                try:
+                    with metrics.timer("image_ingest", source="url"):
+                        final_image_data, payload_bytes, cache_hit = ingest_image_url(
+                            image_url, max_edge, image_format, image_quality, max_download_mb * 1024 * 1024,
+                            use_cache=cache_mode == CACHE_MODE_ON)
+                except Exception as e:
+                    return self._error(f"下载图片URL失败: {e}", fallback_text)
+                metrics.incr("cache_lookups_total", cache="image_url", result="hit" if cache_hit else "miss")
+                metrics.incr("bytes_total", payload_bytes, direction="image_payload")
+                _log_info(f"URL 图片{'命中缓存' if cache_hit else '下载完成'}，发送 {payload_bytes / 1024:.1f} KB。")
+            else:
+                final_image_data = image_url
+
+        if not final_image_data and frame_sources is None:
+            return self._error("未能获取有效的图片数据。", fallback_text)
+
+        job_journal = get_journal() if journal else None
+
+        def _caption(image_data):
+            # 构建消息内容
+            content_parts = [{"type": "text", "text": final_prompt_text}]
+            content_parts.append({"type": "image_url", "image_url": {"url": image_data}})
+            messages = [{"role": "user", "content": content_parts}]
+
+            def _send(client, api_key, model, timeout):
+                with metrics.timer("api_call", model=model):
+                    response = get_request_engine().call(
+                        api_key,
+                        lambda: client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            **_timeout_kwargs(timeout),
+                        ),
+                        tokens=estimate_request_tokens(messages),
+                        timeout=timeout,
+                    )
+                record_usage(getattr(response, "usage", None), model)
+                # 缓存/日志中保存原始文本，推理段和 box 标记由 PostProcessor 在输出前统一处理
+                return str(response.choices[0].message.content)
+
+            def _request():
+                return _journaled(job_journal, cache_request, lambda: _call_glm(api_keys, models, _send, max_retries, request_deadline),
+                                  cache_mode, node="GLM_Vision_ImageToPrompt", model=model_name, input=_describe_image(image_data))
+
+            cache_request = {"model": model_name, "messages": messages, "seed": seed}
+            try:
+                response_content, cache_hit = cached_call(cache_request, _request, cache_mode)
+            except Exception:
+                metrics.incr("requests_total", node="GLM_Vision_ImageToPrompt", status="error")
+                raise
+            metrics.incr("requests_total", node="GLM_Vision_ImageToPrompt", status="ok")
+            metrics.incr("cache_lookups_total", cache="response", result="hit" if cache_hit else "miss")
+            if cache_hit:
+                _log_info("命中响应缓存。")
+            return response_content
+
+        if frame_sources is not None:
+            _log_info(f"调用 GLM-4V ({model_name})，共 {len(image_data_list)} 张，并发 {concurrency}...")
+
+            def _caption_frame(item):
+                index, image_data = item
+                try:
+                    text = _caption(image_data)
+                except Exception as e:
+                    return _fail(f"GLM-4V API 调用失败: {e}", fallback_text)
+                if cache_mode != CACHE_MODE_BYPASS:
+                    caption_index.add(caption_ns, frame_hashes[index], text)
+                return text
+
+            pending = list(zip(frame_indices, image_data_list))
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pending) or 1))) as executor:
+                for (index, _), text in zip(pending, executor.map(_caption_frame, pending)):
+                    frame_captions[index] = text
+            results = processor.process_many([frame_captions[i] if frame_captions[i] is not None else frame_captions[frame_sources[i]]
+                                              for i in range(len(frame_sources))])
+            _log_info(f"GLM_vsion响应成功，共 {len(results)} 条。")
+            return ("\n".join(results), results)
+
+        if len(image_data_list) > 1:
+            _log_info(f"批量调用 GLM-4V ({model_name})，共 {len(image_data_list)} 张，并发 {concurrency}...")
+
+            def _caption_or_fallback(image_data):
+                try:
+                    return _caption(image_data)
+                except Exception as e:
+                    return _fail(f"GLM-4V API 调用失败: {e}", fallback_text)
+
+            # executor.map 保证结果顺序与输入批次一致
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(image_data_list)))) as executor:
+                results = processor.process_many(list(executor.map(_caption_or_fallback, image_data_list)))
+            _log_info(f"GLM_vsion批量响应成功，共 {len(results)} 条。")
+            return ("\n".join(results), results)
 
         _log_info(f"调用 GLM-4V ({model_name})...")
-    
         try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": content_parts}]
-            )
-            response_content = str(response.choices[0].message.content)
-            if "<|begin_of_box|>" in response_content and "<|end_of_box|>" in response_content:
-                start = response_content.find("<|begin_of_box|>") + len("<|begin_of_box|>")
-                end = response_content.find("<|end_of_box|>")
-                response_content = response_content[start:end].strip()
+            response_content = processor.process(_caption(final_image_data))
             _log_info(f"GLM_vsion响应成功。({response_content})...")
-            return (response_content,)
+            return (response_content, [response_content])
+        except Exception as e:
+            return self._error(f"GLM-4V API 调用失败: {e}", fallback_text)
+
+    @staticmethod
+    def _error(message, fallback_text=""):
+        text = _fail(message, fallback_text)
+        return (text, [text])
+
+
+# GLM批量扩写节点 (Batch API)
+class GLM_Batch_Text_Chat:
+    CATEGORY = "JFD/GLM_Prompt"
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("文本列表", "任务状态")
+    OUTPUT_IS_LIST = (True, False)
+    FUNCTION = "run_batch"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        available_prompts = GLM_Text_Chat.get_text_prompts()
+        prompt_keys = list(available_prompts.keys())
+        default_selection = prompt_keys[0] if prompt_keys else "无可用提示词"
+        return {
+            "required": {
+                "job_name": ("STRING", {"default": "batch_job", "tooltip": "任务名称，相同名称会继续之前未完成的任务"}),
+                "text_system_prompt_preset": (prompt_keys, {"default": default_selection}),
+                "system_prompt_override": ("STRING", {"multiline": True, "default": "", "placeholder": "系统提示词 (最高优先级，留空则从预设加载)"}),
+                "api_key": ("STRING", {"default": "", "multiline": False, "placeholder": "可选：智谱AI API Key，多个用逗号分隔 (留空则尝试从环境变量或config.json读取)"}),
+                "model_name": (TEXT_MODL_LIST, {"default": "GLM-4.5-Flash", "tooltip": "选择大模型"}),
+                "temperature": ("FLOAT", {"default": 0.9, "min": 0.0, "max": 1.0, "step": 0.01}),
+                "top_p": ("FLOAT", {"default": 0.7, "min": 0.0, "max": 1.0, "step": 0.01}),
+                "max_tokens": ("INT", {"default": 1024, "min": 1, "max": 4096}),
+                "text_inputs": ("STRING", {"multiline": True, "default": "", "placeholder": "每行一条需要扩写的内容"}),
+            },
+            "optional": {
+                "prompts_file": ("STRING", {"default": "", "placeholder": "可选：提示词文件路径 (每行一条，优先于上方输入)"}),
+                "poll_interval": ("FLOAT", {"default": 10.0, "min": 1.0, "max": 600.0, "step": 1.0, "tooltip": "初始轮询间隔(秒)，之后按退避递增"}),
+                "max_wait": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 86400.0, "step": 60.0, "tooltip": "最长等待时间(秒)，0=等待完成；超时后可用相同任务名称继续"}),
+                "postprocess_rules": ("STRING", {"default": "", "placeholder": "可选：输出清理规则，如 normalize,dedupe_tags", "tooltip": POSTPROCESS_TOOLTIP}),
+                "max_prompt_tokens": ("INT", {"default": 0, "min": 0, "max": 4096, "tooltip": MAX_PROMPT_TOKENS_TOOLTIP}),
+                "fallback_text": ("STRING", {"multiline": True, "default": "", "placeholder": "可选：任务或条目失败时输出的备用文本 (留空则失败时报错中断)"}),
+            }
+        }
+
+    def run_batch(self, job_name, text_system_prompt_preset, system_prompt_override, api_key, model_name, temperature, top_p, max_tokens, text_inputs,
+                  prompts_file="", poll_interval=10.0, max_wait=0.0, postprocess_rules="", max_prompt_tokens=0, fallback_text=""):
+        api_keys = get_zhipuai_api_keys(api_key)
+        if not api_keys:
+            return self._error("API Key 未提供。", fallback_text)
+        try:
+            processor = get_postprocessor(parse_rules(postprocess_rules), max_prompt_tokens)
+        except ValueError as e:
+            return self._error(str(e), fallback_text)
+
+        if prompts_file and prompts_file.strip():
+            prompts = iter_prompts_file(prompts_file.strip())
+        else:
+            prompts = [line.strip() for line in text_inputs.splitlines() if line.strip()]
+
+        available_prompts = GLM_Text_Chat.get_text_prompts()
+        if system_prompt_override and system_prompt_override.strip():
+            system_prompt = system_prompt_override.strip()
+        else:
+            system_prompt = available_prompts.get(text_system_prompt_preset) or next(iter(available_prompts.values()), "")
+
+        job_dir = os.path.join(CURRENT_DIR, BATCH_JOBS_DIR_NAME, job_name.strip() or "batch_job")
+        # 批处理任务与提交它的 Key 绑定，多个 Key 时固定使用第一个
+        client = get_glm_client(api_keys[0])
+
+        def _on_poll(batch):
+            _log_info(f"批处理任务 {batch.id} 状态: {batch.status} {getattr(batch, 'request_counts', '')}")
+
+        try:
+            with metrics.timer("batch_job", model=model_name):
+                status, results = run_batch_job(
+                    client, job_dir, prompts, model_name, system_prompt,
+                    temperature=temperature, top_p=top_p, max_tokens=max_tokens,
+                    poll_interval=poll_interval, timeout=max_wait, on_poll=_on_poll,
+                )
         except Exception as e:
-            error_message = f"GLM-4V API 调用失败: {e}"
-            _log_error(error_message)
-            return (error_message,)
+            return self._error(f"批处理任务失败: {e}", fallback_text)
+
+        if results is None:
+            _log_warning(f"批处理任务尚未完成 (状态: {status})，可稍后使用相同任务名称继续。")
+            return ([], status)
+
+        succeeded = [i for i, (text, error) in enumerate(results) if error is None and text is not None]
+        texts = [fallback_text] * len(results)
+        for i, text in zip(succeeded, processor.process_many([results[i][0] for i in succeeded])):
+            texts[i] = text
+        failed_items = [{"index": i, "error": error or "结果为空"}
+                        for i, (text, error) in enumerate(results) if error is not None or text is None]
+        for item in failed_items:
+            _log_warning(f"批处理条目 {item['index']} 失败: {item['error']}")
+        failed = len(failed_items)
+        metrics.incr("batch_items_total", len(results) - failed, model=model_name, status="ok")
+        metrics.incr("batch_items_total", failed, model=model_name, status="error")
+        _log_info(f"批处理任务完成 (状态: {status})，成功 {len(results) - failed} 条，失败 {failed} 条。")
+        if failed and not fallback_text:
+            # 与扩写/反推节点一致：没有备用文本时不能把失败条目当作空提示词输出
+            _fail(f"批处理任务有 {failed} 条失败: {json.dumps(failed_items, ensure_ascii=False)}")
+        return (texts, f"{status}: {len(results) - failed}/{len(results)}")
+
+    @staticmethod
+    def _error(message, fallback_text=""):
+        text = _fail(message, fallback_text)
+        return ([text], message)
+
 
 # # --- ComfyUI 节点映射 ---
 # NODE_CLASS_MAPPINGS = {
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import hashlib
+
+BATCH_ENDPOINT = "/v4/chat/completions"
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+STATE_FILE_NAME = "state.json"
+INPUT_FILE_NAME = "input.jsonl"
+OUTPUT_FILE_NAME = "output.jsonl"
+ERROR_FILE_NAME = "errors.jsonl"
+
+
+def make_custom_id(index):
+    return f"item-{index}"
+
+
+def iter_prompts_file(file_path):
+    """逐行读取提示词文件，跳过空行。"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+class BatchJob:
+    """
+    智谱 Batch API 任务，状态保存在 job_dir/state.json，进程重启后可继续。
+    阶段：new -> submitted -> (completed|failed|expired|cancelled) -> downloaded
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.state = {"status": "new"}
+        os.makedirs(job_dir, exist_ok=True)
+        state_path = self._path(STATE_FILE_NAME)
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def _path(self, name):
+        return os.path.join(self.job_dir, name)
+
+    @property
+    def status(self):
+        return self.state.get("status", "new")
+
+    def save(self, **updates):
+        self.state.update(updates)
+        tmp_path = self._path(STATE_FILE_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._path(STATE_FILE_NAME))
+
+    def write_input(self, prompts, model, system_prompt, temperature=None, top_p=None, max_tokens=None):
+        """
+        流式写入 JSONL 请求文件并返回 (请求数, 内容指纹)。
+        已有任务的指纹不一致时抛出 ValueError，避免把不同输入的结果混在一起。
+        """
+        body_params = {"model": model}
+        if temperature is not None:
+            body_params["temperature"] = temperature
+        if top_p is not None:
+            body_params["top_p"] = top_p
+        if max_tokens is not None:
+            body_params["max_tokens"] = max_tokens
+
+        digest = hashlib.sha256()
+        count = 0
+        tmp_path = self._path(INPUT_FILE_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for index, prompt in enumerate(prompts):
+                messages = [{"role": "user", "content": prompt}]
+                if system_prompt:
+                    messages.insert(0, {"role": "system", "content": system_prompt})
+                line = json.dumps({
+                    "custom_id": make_custom_id(index),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": dict(body_params, messages=messages),
+                }, ensure_ascii=False) + "\n"
+                f.write(line)
+                digest.update(line.encode("utf-8"))
+                count += 1
+        fingerprint = digest.hexdigest()
+
+        if self.state.get("fingerprint") not in (None, fingerprint):
+            os.remove(tmp_path)
+            raise ValueError(f"任务目录 {self.job_dir} 已存在不同输入的批处理任务，请更换任务名称。")
+        os.replace(tmp_path, self._path(INPUT_FILE_NAME))
+        if self.status == "new":
+            self.save(fingerprint=fingerprint, count=count, model=model)
+        return count, fingerprint
+
+    def submit(self, client, metadata=None):
+        """上传请求文件并创建批处理任务 (已提交则直接返回 batch_id)。"""
+        if self.state.get("batch_id"):
+            return self.state["batch_id"]
+        if not self.state.get("input_file_id"):
+            with open(self._path(INPUT_FILE_NAME), "rb") as f:
+                file_object = client.files.create(file=f, purpose="batch")
+            self.save(input_file_id=file_object.id)
+        batch = client.batches.create(
+            input_file_id=self.state["input_file_id"],
+            endpoint=BATCH_ENDPOINT,
+            auto_delete_input_file=True,
+            metadata=metadata or {"description": os.path.basename(self.job_dir)},
+        )
+        self.save(batch_id=batch.id, status="submitted", submitted_at=time.time())
+        return batch.id
+
+    def wait(self, client, poll_interval=10.0, max_interval=300.0, timeout=0, on_poll=None):
+        """
+        按指数退避轮询任务状态，直到进入终态或超过 timeout 秒 (0 表示不限制)。
+        返回最新状态。
+        """
+        if self.status in BATCH_TERMINAL_STATUSES or self.status == "downloaded":
+            return self.status
+        started = time.monotonic()
+        interval = poll_interval
+        while True:
+            batch = client.batches.retrieve(self.state["batch_id"])
+            counts = getattr(batch, "request_counts", None)
+            self.save(
+                remote_status=batch.status,
+                output_file_id=batch.output_file_id,
+                error_file_id=batch.error_file_id,
+                request_counts=counts.model_dump() if hasattr(counts, "model_dump") else None,
+            )
+            if on_poll is not None:
+                on_poll(batch)
+            if batch.status in BATCH_TERMINAL_STATUSES:
+                self.save(status=batch.status)
+                return batch.status
+            if timeout and time.monotonic() - started + interval > timeout:
+                return batch.status
+            time.sleep(interval)
+            interval = min(max_interval, interval * 1.5)
+
+    def download(self, client):
+        """下载结果文件 (及错误文件) 到任务目录。"""
+        if self.status == "downloaded":
+            return
+        for key, name in (("output_file_id", OUTPUT_FILE_NAME), ("error_file_id", ERROR_FILE_NAME)):
+            file_id = self.state.get(key)
+            if not file_id:
+                continue
+            tmp_path = self._path(name + ".tmp")
+            client.files.content(file_id).write_to_file(tmp_path)
+            os.replace(tmp_path, self._path(name))
+        self.save(status="downloaded")
+
+    def iter_results(self):
+        """逐行解析结果文件，产出 (custom_id, 文本, 错误信息)。"""
+        for name in (OUTPUT_FILE_NAME, ERROR_FILE_NAME):
+            path = self._path(name)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    response = record.get("response") or {}
+                    body = response.get("body") or {}
+                    if response.get("status_code") == 200 and body.get("choices"):
+                        yield record.get("custom_id"), body["choices"][0]["message"]["content"], None
+                    else:
+                        error = record.get("error") or body.get("error") or body
+                        yield record.get("custom_id"), None, json.dumps(error, ensure_ascii=False)
+
+    def results(self):
+        """按输入顺序返回 [(文本, 错误信息)]，缺失的结果记为错误。"""
+        mapped = {custom_id: (text, error) for custom_id, text, error in self.iter_results()}
+        return [mapped.get(make_custom_id(i), (None, "结果缺失")) for i in range(self.state.get("count", 0))]
+
+
+def run_batch_job(client, job_dir, prompts, model, system_prompt, temperature=None, top_p=None, max_tokens=None,
+                  poll_interval=10.0, max_interval=300.0, timeout=0, on_poll=None):
+    """
+    完整执行 (或继续执行) 一个批处理任务。
+    任务未完成 (超时) 时返回 (状态, None)，完成后返回 (状态, 按输入顺序的结果列表)。
+    """
+    job = BatchJob(job_dir)
+    # 继续已有任务时同样校验输入指纹，防止同名任务混用不同输入
+    job.write_input(prompts, model, system_prompt, temperature, top_p, max_tokens)
+    if job.status == "new":
+        job.submit(client)
+    status = job.wait(client, poll_interval, max_interval, timeout, on_poll)
+    if status not in BATCH_TERMINAL_STATUSES and status != "downloaded":
+        return status, None
+    job.download(client)
+    return job.state.get("remote_status", status), job.results()
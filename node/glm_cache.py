@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 缓存默认参数 (可通过环境变量覆盖)
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("GLM_CACHE_MEMORY_ENTRIES", "1024"))
+DEFAULT_DISK_ENTRIES = int(os.getenv("GLM_CACHE_DISK_ENTRIES", "100000"))
+DEFAULT_TTL = float(os.getenv("GLM_CACHE_TTL", str(7 * 24 * 3600)))
+# 设置后启用磁盘缓存 (SQLite 文件路径)
+DEFAULT_DISK_PATH = os.getenv("GLM_CACHE_DB", "")
+
+# 节点上的缓存开关
+CACHE_MODE_ON = "启用"
+CACHE_MODE_BYPASS = "跳过"
+CACHE_MODE_REFRESH = "刷新"
+CACHE_MODES = [CACHE_MODE_ON, CACHE_MODE_BYPASS, CACHE_MODE_REFRESH]
+
+
+def make_cache_key(request):
+    """对完整请求参数 (dict) 计算稳定的 SHA-256 键。"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _MemoryTier:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at and expires_at < now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class _DiskTier:
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key, now):
+        row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at and expires_at < now:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return value
+
+    def set(self, key, value, expires_at, now):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, now),
+        )
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (max(0, count - self.max_entries),),
+            )
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+
+
+class ResponseCache:
+    """
+    GLM 响应缓存：内存 LRU 一级缓存 + 可选的 SQLite 磁盘二级缓存。
+    值为模型返回的文本。
+    """
+
+    def __init__(self, memory_entries=DEFAULT_MEMORY_ENTRIES, disk_path=DEFAULT_DISK_PATH,
+                 disk_entries=DEFAULT_DISK_ENTRIES, ttl=DEFAULT_TTL):
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self._memory = _MemoryTier(memory_entries)
+        self._disk = _DiskTier(disk_path, disk_entries) if disk_path else None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            value = self._memory.get(key, now)
+            if value is not None:
+                return value
+            if self._disk is not None:
+                value = self._disk.get(key, now)
+                if value is not None:
+                    self._memory.set(key, value, now + self.ttl if self.ttl > 0 else None)
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._memory.set(key, value, expires_at)
+            if self._disk is not None:
+                self._disk.set(key, value, expires_at, now)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.clear()
+
+
+_cache = ResponseCache()
+
+
+def get_response_cache():
+    return _cache
+
+
+def configure_response_cache(**kwargs):
+    """重新创建共享缓存，参数同 ResponseCache。"""
+    global _cache
+    _cache = ResponseCache(**kwargs)
+    return _cache
+
+
+def cached_call(request, fn, cache_mode=CACHE_MODE_ON):
+    """
+    按 cache_mode 查询/写入缓存后返回 (文本, 是否命中)。
+    fn 无参数，返回模型输出文本。
+    """
+    if cache_mode == CACHE_MODE_BYPASS:
+        return fn(), False
+    key = make_cache_key(request)
+    if cache_mode != CACHE_MODE_REFRESH:
+        value = _cache.get(key)
+        if value is not None:
+            return value, True
+    value = fn()
+    _cache.set(key, value)
+    return value, False
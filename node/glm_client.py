@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+
+# 连接池默认参数 (可通过环境变量覆盖)
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("GLM_POOL_MAX_CONNECTIONS", "20"))
+DEFAULT_MAX_KEEPALIVE = int(os.getenv("GLM_POOL_MAX_KEEPALIVE", "10"))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.getenv("GLM_POOL_KEEPALIVE_EXPIRY", "60"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("GLM_CLIENT_IDLE_TIMEOUT", "600"))
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("GLM_REQUEST_TIMEOUT", "300"))
+
+
+class _ClientEntry:
+    __slots__ = ("client", "http_client", "last_used")
+
+    def __init__(self, client, http_client):
+        self.client = client
+        self.http_client = http_client
+        self.last_used = time.monotonic()
+
+
+class GLMClientRegistry:
+    """
+    进程级智谱AI客户端注册表。
+    按 (api_key, base_url) 复用 ZhipuAI 客户端及其 keep-alive 连接池，
+    长时间未使用的客户端会被回收并关闭连接。
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, max_keepalive=DEFAULT_MAX_KEEPALIVE,
+                 keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.configure(max_connections, max_keepalive, keepalive_expiry, idle_timeout, request_timeout)
+
+    def configure(self, max_connections=None, max_keepalive=None, keepalive_expiry=None,
+                  idle_timeout=None, request_timeout=None):
+        """调整连接池参数，仅对之后新建的客户端生效。"""
+        with self._lock:
+            if max_connections is not None:
+                self.max_connections = max_connections
+            if max_keepalive is not None:
+                self.max_keepalive = max_keepalive
+            if keepalive_expiry is not None:
+                self.keepalive_expiry = keepalive_expiry
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+            if request_timeout is not None:
+                self.request_timeout = request_timeout
+
+    def _create(self, api_key, base_url):
+        # zhipuai (连同 httpx/pydantic) 导入较慢，延迟到第一次创建客户端时
+        import httpx
+        from zhipuai import ZhipuAI
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.request_timeout, connect=10.0),
+        )
+        # 重试由 glm_resilience 统一处理，关闭 SDK 内置重试避免叠加
+        client = ZhipuAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        return _ClientEntry(client, http_client)
+
+    def get(self, api_key, base_url=None):
+        """获取 (必要时创建) 与 api_key/base_url 对应的共享客户端。"""
+        base_url = base_url or os.getenv("ZHIPUAI_BASE_URL") or None
+        key = (api_key, base_url)
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._create(api_key, base_url)
+                self._entries[key] = entry
+            entry.last_used = time.monotonic()
+            return entry.client
+
+    def _evict_idle_locked(self):
+        if self.idle_timeout <= 0:
+            return
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if now - e.last_used > self.idle_timeout]:
+            self._close_entry(self._entries.pop(key))
+
+    @staticmethod
+    def _close_entry(entry):
+        try:
+            entry.http_client.close()
+        except Exception:
+            pass
+
+    def evict_idle(self):
+        """立即回收所有超过空闲时间的客户端。"""
+        with self._lock:
+            self._evict_idle_locked()
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._entries.values():
+                self._close_entry(entry)
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_registry = GLMClientRegistry()
+
+
+def get_glm_client(api_key, base_url=None):
+    """返回进程内共享的智谱AI客户端。"""
+    return _registry.get(api_key, base_url)
+
+
+def configure_glm_client_pool(**kwargs):
+    """配置共享连接池参数，参见 GLMClientRegistry.configure。"""
+    _registry.configure(**kwargs)
+
+
+def close_glm_clients():
+    _registry.close_all()
@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from .glm_tokens import estimate_messages_tokens
+from .glm_resilience import DeadlineExceededError
+
+# 执行引擎默认参数 (可通过环境变量或 config.json 覆盖，0 表示不限制)
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("GLM_MAX_IN_FLIGHT", "8"))
+DEFAULT_RPM = float(os.getenv("GLM_RPM", "0"))
+DEFAULT_TPM = float(os.getenv("GLM_TPM", "0"))
+
+def estimate_request_tokens(messages, max_tokens=0):
+    """估算一次请求消耗的 token (输入 + 最大输出)，用于 TPM 限流预占。"""
+    return estimate_messages_tokens(messages) + (max_tokens or 0)
+
+
+class TokenBucket:
+    """令牌桶，rate_per_minute <= 0 表示不限制。"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return self.rate <= 0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount, now):
+        """返回还需等待多少秒才能取出 amount 个令牌。"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # 单次需求超过桶容量时，只要求桶满即可放行，避免永久阻塞
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        """取出令牌，amount 为负数时归还 (允许余额暂时为负)。"""
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """单个 API Key 的 RPM + TPM 限流器。"""
+
+    def __init__(self, rpm=0, tpm=0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def wait_time(self, tokens, now):
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def consume(self, tokens, now):
+        self.requests.consume(1, now)
+        self.tokens.consume(tokens, now)
+
+    def refund_tokens(self, tokens, now):
+        self.tokens.consume(-tokens, now)
+
+
+class _Job:
+    __slots__ = ("fn", "tokens", "future")
+
+    def __init__(self, fn, tokens):
+        self.fn = fn
+        self.tokens = tokens
+        self.future = Future()
+
+
+class GLMRequestEngine:
+    """
+    共享的 GLM 请求执行引擎。
+    - 工作线程数即最大并发请求数 (in-flight 上限)
+    - 每个 API Key 独立的 RPM/TPM 令牌桶限流
+    - 不同 API Key 的排队请求轮询调度，避免单个 Key 的突发请求饿死其他 Key
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.rpm = rpm
+        self.tpm = tpm
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._order = deque()
+        self._limiters = {}
+        self._workers = []
+        self._closed = False
+
+    def _limiter(self, api_key):
+        limiter = self._limiters.get(api_key)
+        if limiter is None:
+            limiter = self._limiters[api_key] = RateLimiter(self.rpm, self.tpm)
+        return limiter
+
+    def _ensure_workers(self):
+        while len(self._workers) < self.max_in_flight:
+            worker = threading.Thread(target=self._worker_loop, name=f"GLMEngine-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, api_key, fn, tokens=0):
+        """提交请求，返回 Future。fn 无参数，返回值若带 usage.total_tokens 会用于校正 TPM 预占。"""
+        job = _Job(fn, tokens)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GLM 请求引擎已关闭。")
+            queue = self._queues.get(api_key)
+            if queue is None:
+                queue = self._queues[api_key] = deque()
+                self._order.append(api_key)
+            queue.append((api_key, job))
+            self._ensure_workers()
+            self._cond.notify()
+        return job.future
+
+    def call(self, api_key, fn, tokens=0, timeout=None):
+        """
+        同步接口：提交并等待结果，异常原样抛出。
+        timeout 为剩余的截止时间 (秒)，排队加执行超过该时间时取消请求并抛出 DeadlineExceededError。
+        """
+        future = self.submit(api_key, fn, tokens)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # 仍在排队的请求会被取消；已在执行的请求无法中断，由其自身的超时结束
+            future.cancel()
+            raise DeadlineExceededError(f"请求在截止时间内未完成 (等待 {timeout:.1f}s)。")
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                now = time.monotonic()
+                min_wait = None
+                for _ in range(len(self._order)):
+                    if not self._order:
+                        break
+                    api_key = self._order[0]
+                    self._order.rotate(-1)
+                    queue = self._queues[api_key]
+                    # 已超时取消的请求直接丢弃，不占用限流额度
+                    while queue and queue[0][1].future.cancelled():
+                        queue.popleft()
+                    if not queue:
+                        del self._queues[api_key]
+                        self._order.remove(api_key)
+                        continue
+                    _, job = queue[0]
+                    limiter = self._limiter(api_key)
+                    wait = limiter.wait_time(job.tokens, now)
+                    if wait <= 0:
+                        queue.popleft()
+                        if not queue:
+                            del self._queues[api_key]
+                            self._order.remove(api_key)
+                        limiter.consume(job.tokens, now)
+                        return api_key, job
+                    min_wait = wait if min_wait is None else min(min_wait, wait)
+                self._cond.wait(timeout=min_wait)
+
+    def _worker_loop(self):
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+            api_key, job = item
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = job.fn()
+            except BaseException as e:
+                job.future.set_exception(e)
+                continue
+            usage = getattr(result, "usage", None)
+            actual = getattr(usage, "total_tokens", None)
+            if actual is not None and job.tokens:
+                with self._cond:
+                    self._limiter(api_key).refund_tokens(job.tokens - actual, time.monotonic())
+                    self._cond.notify_all()
+            job.future.set_result(result)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            pending = [job for queue in self._queues.values() for _, job in queue]
+            self._queues.clear()
+            self._order.clear()
+            self._cond.notify_all()
+        for job in pending:
+            job.future.cancel()
+
+
+_engine = GLMRequestEngine()
+
+
+def get_request_engine():
+    return _engine
+
+
+def configure_request_engine(**kwargs):
+    """用新参数替换共享引擎，参数同 GLMRequestEngine。"""
+    global _engine
+    old = _engine
+    _engine = GLMRequestEngine(**kwargs)
+    old.shutdown()
+    return _engine
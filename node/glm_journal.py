@@ -0,0 +1,296 @@
+import os
+import csv
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 任务日志文件 (可通过环境变量指定路径)
+JOURNAL_FILE = os.getenv("GLM_JOURNAL_FILE", os.path.join(CURRENT_DIR, '..', 'glm_journal.jsonl'))
+# 每累计多少条记录或间隔多少秒执行一次 fsync；每条记录写入后都会 flush，进程崩溃不丢数据
+FSYNC_EVERY = int(os.getenv("GLM_JOURNAL_FSYNC_EVERY", "32"))
+FSYNC_INTERVAL = float(os.getenv("GLM_JOURNAL_FSYNC_INTERVAL", "1.0"))
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+EXPORT_FORMATS = ("jsonl", "csv")
+CSV_FIELDS = ("ts", "key", "status", "latency", "node", "model", "input", "result", "error")
+
+
+def iter_records(path):
+    """逐行读取日志记录，跳过无法解析的行 (如崩溃时写了一半的最后一行)。"""
+    if not os.path.exists(path):
+        return
+    # 按字节读取再逐行解码：崩溃时截断在多字节字符中间的行只会被跳过，不会中断整个文件的读取
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("key"):
+                yield record
+
+
+def _match(record, status=None, node=None, model=None, since=None, contains=None):
+    if status and record.get("status") != status:
+        return False
+    if node and record.get("node") != node:
+        return False
+    if model and record.get("model") != model:
+        return False
+    if since and (record.get("ts") or 0) < since:
+        return False
+    if contains and contains not in (record.get("input") or "") and contains not in (record.get("result") or ""):
+        return False
+    return True
+
+
+class JobJournal:
+    """
+    只追加的 JSONL 任务日志：每次请求记录一行 (请求哈希、状态、耗时、结果)。
+    打开时载入已成功的请求，中断后重新运行同样的输入会直接复用结果，不再重复调用接口。
+    """
+
+    def __init__(self, path=JOURNAL_FILE, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer = None
+        self._completed = {}
+        for record in iter_records(path):
+            if record.get("status") == STATUS_OK:
+                self._completed[record["key"]] = record.get("result")
+
+    def _open_locked(self):
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # 上次崩溃留下的半行不能和新记录拼在一起 (按字节检查，避免落在多字节字符中间)
+            with open(self.path, "ab+") as raw:
+                if raw.tell() > 0:
+                    raw.seek(-1, os.SEEK_END)
+                    if raw.read(1) != b"\n":
+                        raw.write(b"\n")
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def __len__(self):
+        return len(self._completed)
+
+    def get(self, key):
+        """返回已成功请求的结果，没有则返回 None。"""
+        with self._lock:
+            return self._completed.get(key)
+
+    def record(self, key, status, latency, result=None, error=None, **fields):
+        record = {"ts": round(time.time(), 3), "key": key, "status": status, "latency": round(latency, 3)}
+        record.update((k, v) for k, v in fields.items() if v is not None)
+        if result is not None:
+            record["result"] = result
+        if error is not None:
+            record["error"] = error
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            f = self._open_locked()
+            f.write(line)
+            f.flush()
+            if status == STATUS_OK:
+                self._completed[key] = result
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            elif self._timer is None:
+                # 记录较少时由定时器在 fsync_interval 内补一次 fsync
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """将尚未 fsync 的记录立即落盘。"""
+        with self._lock:
+            self._sync_locked()
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def query(self, status=None, node=None, model=None, since=None, contains=None, latest=True, limit=0):
+        """
+        按条件查询日志记录 (按写入顺序)。latest=True 时同一请求只保留最后一条记录，
+        limit>0 时只返回最后 limit 条。
+        """
+        self.sync()
+        records = iter_records(self.path)
+        if latest:
+            merged = {}
+            for record in records:
+                merged.pop(record["key"], None)
+                merged[record["key"]] = record
+            records = merged.values()
+        matched = [r for r in records if _match(r, status, node, model, since, contains)]
+        return matched[-limit:] if limit > 0 else matched
+
+    def export(self, out_path, fmt="jsonl", **filters):
+        """导出查询结果到 JSONL 或 CSV 文件，返回导出条数。"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        records = self.query(**filters)
+        directory = os.path.dirname(os.path.abspath(out_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(out_path, "w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(records)
+
+    def compact(self):
+        """重写日志，每个请求只保留最后一条记录，返回保留条数。"""
+        records = self.query()
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+        return len(records)
+
+    def stats(self):
+        counts = {}
+        for record in self.query():
+            counts[record.get("status")] = counts.get(record.get("status"), 0) + 1
+        return {"path": os.path.abspath(self.path), "requests": sum(counts.values()), "by_status": counts}
+
+
+_journal_lock = threading.Lock()
+_journals = {}
+
+
+def get_journal(path=JOURNAL_FILE):
+    with _journal_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = JobJournal(path)
+        return journal
+
+
+@atexit.register
+def _close_journals():
+    with _journal_lock:
+        for journal in _journals.values():
+            journal.close()
+
+
+def journaled_call(journal, key, fn, refresh=False, **fields):
+    """
+    先查日志中已成功的结果，未命中 (或 refresh) 时调用 fn 并记录结果或错误。
+    返回 (文本, 是否从日志恢复)；fields 为附加记录字段 (node/model/input 等)。
+    """
+    if not refresh:
+        result = journal.get(key)
+        if result is not None:
+            return result, True
+    started = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        journal.record(key, STATUS_ERROR, time.perf_counter() - started, error=str(e), **fields)
+        raise
+    journal.record(key, STATUS_OK, time.perf_counter() - started, result=result, **fields)
+    return result, False
+
+
+def register_journal_routes():
+    """在 ComfyUI 服务上注册 /glm_prompt/journal 查询接口 (参数同 JobJournal.query)。"""
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return False
+
+    @PromptServer.instance.routes.get("/glm_prompt/journal")
+    async def _journal(request):
+        params = request.rel_url.query
+        journal = get_journal()
+        records = journal.query(
+            status=params.get("status"), node=params.get("node"), model=params.get("model"),
+            since=float(params["since"]) if params.get("since") else None, contains=params.get("contains"),
+            limit=int(params.get("limit", "100")),
+        )
+        return web.json_response({"stats": journal.stats(), "records": records})
+
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询/导出 GLM 任务日志")
+    parser.add_argument("--file", default=JOURNAL_FILE, help="日志文件路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="按状态统计请求数")
+    sub.add_parser("compact", help="每个请求只保留最后一条记录")
+    for name in ("query", "export"):
+        p = sub.add_parser(name)
+        p.add_argument("--status", choices=(STATUS_OK, STATUS_ERROR))
+        p.add_argument("--node")
+        p.add_argument("--model")
+        p.add_argument("--since", type=float, help="Unix 时间戳")
+        p.add_argument("--contains", help="输入或结果包含的文本")
+        p.add_argument("--all", action="store_true", help="保留同一请求的全部记录")
+        if name == "query":
+            p.add_argument("--limit", type=int, default=20)
+        else:
+            p.add_argument("output")
+            p.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    args = parser.parse_args(argv)
+
+    journal = JobJournal(args.file)
+    if args.command == "stats":
+        print(json.dumps(journal.stats(), ensure_ascii=False, indent=2))
+    elif args.command == "compact":
+        print(f"保留 {journal.compact()} 条记录。")
+    else:
+        filters = dict(status=args.status, node=args.node, model=args.model, since=args.since,
+                       contains=args.contains, latest=not args.all)
+        if args.command == "query":
+            for record in journal.query(limit=args.limit, **filters):
+                print(json.dumps(record, ensure_ascii=False))
+        else:
+            print(f"已导出 {journal.export(args.output, args.format, **filters)} 条记录到 {args.output}。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
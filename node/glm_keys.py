@@ -0,0 +1,148 @@
+import time
+import threading
+
+from .glm_resilience import CircuitOpenError, is_rate_limit_error, retry_after_seconds
+
+# 触发限流/额度错误后，Key 的默认冷却时间 (秒)
+DEFAULT_COOLDOWN = 60.0
+
+
+def mask_api_key(api_key):
+    """日志和统计中只显示 Key 的首尾几位。"""
+    if len(api_key) <= 10:
+        return api_key[:2] + "***"
+    return f"{api_key[:6]}***{api_key[-4:]}"
+
+
+def is_failover_error(exc):
+    """限流/额度不足/熔断打开时切换到下一个 Key 或模型。"""
+    return is_rate_limit_error(exc) or isinstance(exc, CircuitOpenError)
+
+
+class KeyStats:
+    __slots__ = ("requests", "in_flight", "successes", "failures", "rate_limited", "cooldown_until", "last_error")
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+        self.last_error = ""
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+            "last_error": self.last_error,
+        }
+
+
+class APIKeyPool:
+    """
+    多 API Key 负载均衡：优先选择未冷却且并发最少的 Key，
+    限流/额度错误后该 Key 进入冷却期 (优先使用 Retry-After)。
+    """
+
+    def __init__(self, api_keys):
+        self.api_keys = list(dict.fromkeys(api_keys))
+        self._stats = {key: _stats_for(key) for key in self.api_keys}
+
+    def __len__(self):
+        return len(self.api_keys)
+
+    def acquire(self, exclude=()):
+        """选出下一个 Key 并计入并发；exclude 中的 Key 不参与选择，全部排除时返回 None。"""
+        with _stats_lock:
+            candidates = [key for key in self.api_keys if key not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            ready = [key for key in candidates if self._stats[key].cooldown_until <= now]
+            if ready:
+                key = min(ready, key=lambda k: (self._stats[k].in_flight, self._stats[k].requests))
+            else:
+                key = min(candidates, key=lambda k: self._stats[k].cooldown_until)
+            stats = self._stats[key]
+            stats.in_flight += 1
+            stats.requests += 1
+            return key
+
+    def release(self, api_key, error=None):
+        with _stats_lock:
+            stats = self._stats[api_key]
+            stats.in_flight -= 1
+            if error is None:
+                stats.successes += 1
+                stats.cooldown_until = 0.0
+                return
+            stats.failures += 1
+            stats.last_error = str(error)[:200]
+            if is_rate_limit_error(error):
+                stats.rate_limited += 1
+                cooldown = retry_after_seconds(error)
+                stats.cooldown_until = time.monotonic() + (cooldown if cooldown is not None else DEFAULT_COOLDOWN)
+
+
+# 统计按 Key 全局共享，不同节点/不同 Key 组合看到的是同一份计数
+_stats_lock = threading.Lock()
+_all_stats = {}
+_pools = {}
+
+
+def _stats_for(api_key):
+    with _stats_lock:
+        stats = _all_stats.get(api_key)
+        if stats is None:
+            stats = _all_stats[api_key] = KeyStats()
+        return stats
+
+
+def get_key_pool(api_keys):
+    key = tuple(dict.fromkeys(api_keys))
+    with _stats_lock:
+        pool = _pools.get(key)
+    if pool is None:
+        pool = APIKeyPool(key)
+        with _stats_lock:
+            pool = _pools.setdefault(key, pool)
+    return pool
+
+
+def get_api_key_usage():
+    """返回各 Key 的使用统计，Key 已脱敏。"""
+    with _stats_lock:
+        items = list(_all_stats.items())
+    return {mask_api_key(key): stats.as_dict() for key, stats in items}
+
+
+def call_with_failover(pool, models, attempt):
+    """
+    依次尝试 models 中的模型；每个模型在 Key 池内按负载选择 Key，
+    遇到限流/额度/熔断错误时换下一个 Key，所有 Key 都失败后降级到下一个模型。
+    attempt(api_key, model) 返回结果；返回 (结果, 实际使用的模型)。
+    """
+    last_error = None
+    for model in models:
+        tried = set()
+        while True:
+            api_key = pool.acquire(exclude=tried)
+            if api_key is None:
+                break
+            tried.add(api_key)
+            try:
+                result = attempt(api_key, model)
+            except Exception as e:
+                pool.release(api_key, e)
+                if not is_failover_error(e):
+                    raise
+                last_error = e
+                continue
+            pool.release(api_key)
+            return result, model
+    raise last_error
@@ -0,0 +1,165 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+# 默认重试/熔断参数 (可通过环境变量覆盖)
+DEFAULT_MAX_RETRIES = int(os.getenv("GLM_MAX_RETRIES", "3"))
+DEFAULT_BASE_DELAY = float(os.getenv("GLM_RETRY_BASE_DELAY", "1.0"))
+DEFAULT_MAX_DELAY = float(os.getenv("GLM_RETRY_MAX_DELAY", "30.0"))
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("GLM_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET = float(os.getenv("GLM_BREAKER_RESET", "30.0"))
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求被快速拒绝。"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """请求在截止时间内未能完成 (含重试)。"""
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def retry_after_seconds(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc):
+    """返回 (是否可重试, Retry-After 秒数或 None)。"""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES, retry_after_seconds(exc)
+    name = type(exc).__name__
+    if isinstance(exc, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name:
+        return True, None
+    return False, None
+
+
+def is_rate_limit_error(exc):
+    return _status_code(exc) == 429
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后打开，reset_timeout 秒内直接拒绝请求；
+    之后进入半开状态放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(f"熔断器已打开，约 {max(remaining, 0):.0f} 秒后重试。")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """请求因客户端错误失败，不计入熔断统计。"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers_lock = threading.Lock()
+_breakers = {}
+
+
+def get_circuit_breaker(key):
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker()
+        return breaker
+
+
+def call_with_resilience(fn, breaker_key, max_retries=DEFAULT_MAX_RETRIES, deadline=0,
+                         base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, on_retry=None,
+                         retry_rate_limited=True):
+    """
+    执行 fn(timeout)，对 429/5xx/超时按带抖动的指数退避重试 (优先遵循 Retry-After)。
+    fn 收到本次尝试剩余的超时秒数 (无截止时间时为 None)。
+    deadline > 0 时为整个请求 (含重试) 的截止秒数；breaker_key 对应的熔断器打开时直接抛出 CircuitOpenError。
+    retry_rate_limited=False 时 429 直接抛出，由调用方切换 Key/模型。
+    """
+    breaker = get_circuit_breaker(breaker_key)
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        remaining = None
+        if deadline and deadline > 0:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                raise DeadlineExceededError(f"请求超过截止时间 ({deadline}s)。")
+        breaker.before_call()
+        try:
+            result = fn(remaining)
+        except Exception as e:
+            retryable, retry_after = classify_error(e)
+            if retryable:
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            if not retryable or attempt >= max_retries or (not retry_rate_limited and is_rate_limit_error(e)):
+                raise
+            delay = retry_after if retry_after is not None else random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            if deadline and deadline > 0 and time.monotonic() - started + delay >= deadline:
+                raise
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, delay, e)
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
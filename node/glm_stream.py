@@ -0,0 +1,114 @@
+import time
+import queue
+import threading
+
+from .postprocess import get_postprocessor, strip_partial_marker
+
+# 预览推送的最小间隔 (秒)
+PREVIEW_INTERVAL = 0.1
+
+
+class BoxStreamFilter:
+    """
+    收集流式输出。preview() 用 PostProcessor (去掉推理段、提取 box 等) 处理当前文本，
+    末尾可能是标记前缀的部分暂不显示；text() 返回原始文本，由节点在输出前统一处理。
+    """
+
+    def __init__(self, processor=None):
+        self._chunks = []
+        self._processor = processor or get_postprocessor()
+
+    def feed(self, chunk):
+        if chunk:
+            self._chunks.append(chunk)
+
+    def preview(self):
+        return self._processor.apply([strip_partial_marker("".join(self._chunks))])[0]
+
+    def text(self):
+        return "".join(self._chunks)
+
+
+class StreamResult:
+    __slots__ = ("text", "usage")
+
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage = usage
+
+
+def _close_stream(stream):
+    for target in (stream, getattr(stream, "response", None)):
+        close = getattr(target, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+            return
+
+
+def stream_completion(create_stream, on_preview=None, first_token_timeout=30.0, total_timeout=300.0, processor=None):
+    """
+    消费流式补全并返回 StreamResult。
+    create_stream 无参数，返回可迭代的 chunk 流 (create(..., stream=True))；
+    on_preview(text) 会以节流的方式收到当前可显示的文本 (经 processor 处理，默认只去掉推理段和 box 标记)；
+    返回的 StreamResult.text 为原始文本。
+    首个 token 或整体超时会关闭连接并抛出 TimeoutError。
+    """
+    chunks = queue.Queue()
+    holder = {}
+    _done = object()
+
+    def _produce():
+        try:
+            stream = create_stream()
+            holder["stream"] = stream
+            for chunk in stream:
+                chunks.put(chunk)
+        except BaseException as e:
+            chunks.put(e)
+        chunks.put(_done)
+
+    threading.Thread(target=_produce, name="GLMStream", daemon=True).start()
+
+    box_filter = BoxStreamFilter(processor)
+    usage = None
+    started = time.monotonic()
+    first_token_at = None
+    last_preview = 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            remaining = total_timeout - (now - started) if total_timeout > 0 else None
+            if first_token_at is None and first_token_timeout > 0:
+                first_remaining = first_token_timeout - (now - started)
+                remaining = first_remaining if remaining is None else min(remaining, first_remaining)
+            if remaining is not None and remaining <= 0:
+                raise queue.Empty
+            item = chunks.get(timeout=remaining)
+            if item is _done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            usage = getattr(item, "usage", None) or usage
+            if not item.choices:
+                continue
+            delta = item.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            box_filter.feed(delta)
+            if on_preview is not None and time.monotonic() - last_preview >= PREVIEW_INTERVAL:
+                last_preview = time.monotonic()
+                on_preview(box_filter.preview())
+    except queue.Empty:
+        _close_stream(holder.get("stream"))
+        if first_token_at is None:
+            raise TimeoutError(f"等待首个 token 超时 ({first_token_timeout}s)。")
+        raise TimeoutError(f"流式响应总时长超时 ({total_timeout}s)。")
+
+    if on_preview is not None:
+        on_preview(box_filter.preview())
+    return StreamResult(box_filter.text(), usage)
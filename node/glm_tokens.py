@@ -0,0 +1,122 @@
+import re
+from functools import lru_cache
+
+# 本地 token 估算：GLM 分词器未随 SDK 提供，按字符类别近似
+# (中文约 0.7 token/字，英文/数字/符号约 4 字符/token)，用于发送前的预算与截断，实际用量以 response.usage 为准。
+CJK_TOKENS_PER_CHAR = 0.7
+LATIN_CHARS_PER_TOKEN = 4.0
+# 每条消息的角色/分隔符开销
+MESSAGE_OVERHEAD_TOKENS = 4
+# 每张图片按固定 token 计
+IMAGE_TOKEN_ESTIMATE = 1000
+
+# 模型上下文窗口 (输入 + 输出 token)
+MODEL_CONTEXT_WINDOWS = {
+    "GLM-4.5": 128000,
+    "GLM-4.5-air": 128000,
+    "GLM-4.5-x": 128000,
+    "GLM-4.5-airx": 128000,
+    "GLM-4.5-Flash": 128000,
+    "GLM-4-plus": 128000,
+    "GLM-4-air-250414": 128000,
+    "GLM-4-airx": 8192,
+    "GLM-4-Flashx": 128000,
+    "GLM-4-Flashx-250414": 128000,
+    "GLM-z1-air": 128000,
+    "GLM-z1-airx": 32768,
+    "GLM-z1-Flash": 128000,
+    "GLM-z1-Flashx": 128000,
+    "GLM-4.5v": 65536,
+    "GLM-4v-plus-0111": 16384,
+    "GLM-4v-flash": 8192,
+    "GLM-4.1v-thinking-flashx": 65536,
+    "GLM-4.1v-thinking-flash": 65536,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# 为输出保留的最少 token，输入过长导致可用输出低于该值时视为溢出
+MIN_COMPLETION_TOKENS = 256
+
+CONTEXT_OVERFLOW_WARN = "警告"
+CONTEXT_OVERFLOW_TRUNCATE = "截断"
+CONTEXT_OVERFLOW_MODES = [CONTEXT_OVERFLOW_WARN, CONTEXT_OVERFLOW_TRUNCATE]
+
+_CJK_RE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def _count_tokens(text):
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return int(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) / LATIN_CHARS_PER_TOKEN) + 1
+
+
+@lru_cache(maxsize=1024)
+def estimate_tokens(text):
+    """估算单段文本的 token 数；结果按文本缓存，预设提示词只计算一次。"""
+    return _count_tokens(text)
+
+
+def estimate_messages_tokens(messages):
+    """估算消息列表的输入 token (文本 + 图片 + 每条消息的固定开销)。"""
+    tokens = 0
+    for message in messages:
+        tokens += MESSAGE_OVERHEAD_TOKENS
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += estimate_tokens(part.get("text", ""))
+                else:
+                    tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+def context_window(models):
+    """多个候选模型时取最小的上下文窗口，保证降级后请求仍然合法。"""
+    if isinstance(models, str):
+        models = [models]
+    return min(MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW) for model in models)
+
+
+def truncate_text(text, max_tokens):
+    """按估算比例截断文本到 max_tokens 以内 (保留开头)。"""
+    tokens = _count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / tokens)
+    while keep > 0 and _count_tokens(text[:keep]) > max_tokens:
+        keep = int(keep * 0.9)
+    return text[:keep]
+
+
+def fit_context(messages, max_tokens, models, overflow=CONTEXT_OVERFLOW_WARN):
+    """
+    按模型上下文窗口调整请求，返回 (messages, max_tokens, 预计输入 token, 警告信息或 None)。
+    输入 + max_tokens 超出窗口时先压缩 max_tokens；输入本身过长时按 overflow
+    截断最后一条用户消息，或原样发送并返回警告。
+    """
+    window = context_window(models)
+    prompt_tokens = estimate_messages_tokens(messages)
+    if prompt_tokens + max_tokens <= window:
+        return messages, max_tokens, prompt_tokens, None
+
+    available = window - prompt_tokens
+    if available >= MIN_COMPLETION_TOKENS:
+        return messages, available, prompt_tokens, f"max_tokens 已从 {max_tokens} 压缩到 {available} 以适应上下文窗口 {window}。"
+
+    overflow_message = f"输入约 {prompt_tokens} tokens，超出模型上下文窗口 {window}。"
+    last_content = messages[-1].get("content") if messages else None
+    if overflow != CONTEXT_OVERFLOW_TRUNCATE or not isinstance(last_content, str):
+        return messages, max_tokens, prompt_tokens, overflow_message
+
+    fixed_tokens = prompt_tokens - estimate_tokens(last_content)
+    budget = window - MIN_COMPLETION_TOKENS - fixed_tokens
+    if budget <= 0:
+        raise ValueError(f"系统提示词约 {fixed_tokens} tokens，已超出模型上下文窗口 {window}。")
+    messages = messages[:-1] + [dict(messages[-1], content=truncate_text(last_content, budget))]
+    prompt_tokens = estimate_messages_tokens(messages)
+    # 只会压缩，不能超过用户设置的 max_tokens
+    return messages, min(max_tokens, window - prompt_tokens), prompt_tokens, overflow_message + "已截断用户输入。"
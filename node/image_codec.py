@@ -0,0 +1,62 @@
+import io
+import base64
+
+# PIL/numpy 在首次编码时才导入，节点注册时不加载
+
+IMAGE_FORMATS = ["JPEG", "WEBP", "PNG"]
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def frame_to_uint8(frame):
+    """
+    将单帧 IMAGE (torch 张量或 ndarray，范围[0,1]，形状[H, W, C]) 转为 uint8 数组。
+    数值在 [0,1] 内时直接乘法写入 uint8 输出，不产生中间浮点副本。
+    """
+    import numpy as np
+
+    arr = frame.cpu().numpy() if hasattr(frame, "cpu") else np.asarray(frame)
+    if arr.dtype == np.uint8:
+        return arr
+    out = np.empty(arr.shape, dtype=np.uint8)
+    if arr.size and (arr.min() < 0 or arr.max() > 1):
+        arr = np.clip(arr, 0, 1)
+    np.multiply(arr, 255, out=out, casting="unsafe")
+    return out
+
+
+def frame_to_pil(frame, max_edge=0):
+    """单帧 IMAGE 转 PIL 图片，max_edge > 0 时按长边等比缩小。"""
+    from PIL import Image
+
+    img = Image.fromarray(frame_to_uint8(frame))
+    if max_edge and max(img.size) > max_edge:
+        # reducing_gap 先做整数倍快速缩小，再精确重采样
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+    return img
+
+
+def encode_pil(img, fmt="JPEG", quality=90):
+    """编码 PIL 图片，返回 (字节, MIME 类型)。"""
+    fmt = fmt.upper()
+    if fmt not in _MIME_TYPES:
+        raise ValueError(f"不支持的图片格式: {fmt}")
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffered = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buffered, format="PNG")
+    else:
+        img.save(buffered, format=fmt, quality=quality)
+    return buffered.getvalue(), _MIME_TYPES[fmt]
+
+
+def encode_frame(frame, fmt="JPEG", quality=90, max_edge=0):
+    """编码单帧 IMAGE，返回 (字节, MIME 类型)。"""
+    return encode_pil(frame_to_pil(frame, max_edge), fmt, quality)
+
+
+def encode_frame_data_url(frame, fmt="JPEG", quality=90, max_edge=0):
+    """编码单帧 IMAGE 为 Base64 data URL，返回 (data_url, 编码后图片字节数)。"""
+    data, mime = encode_frame(frame, fmt, quality, max_edge)
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii"), len(data)
@@ -0,0 +1,182 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 图片描述去重索引 (可通过环境变量指定路径)
+CAPTION_INDEX_DB = os.getenv("GLM_CAPTION_INDEX_DB", os.path.join(CURRENT_DIR, '..', 'caption_index.db'))
+
+# dHash 边长，8 即 64 位哈希
+HASH_SIZE = 8
+_HASH_MASK = (1 << 64) - 1
+
+# ITU-R BT.601 灰度权重
+_GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def dhash(frame, hash_size=HASH_SIZE):
+    """
+    计算单帧 IMAGE (torch 张量或 ndarray，形状[H, W, C]) 的 dHash：
+    灰度化后缩小为 (hash_size+1)×hash_size，比较水平相邻像素得到 hash_size² 位整数。
+    """
+    from PIL import Image
+    import numpy as np
+
+    arr = frame.cpu().numpy() if hasattr(frame, "cpu") else np.asarray(frame)
+    if arr.ndim == 3:
+        arr = arr[..., :3] @ np.asarray(_GRAY_WEIGHTS[:arr.shape[-1]], dtype=np.float32)
+    # 直接在浮点灰度图上做区域平均缩小，不经过 uint8 转换
+    small = Image.fromarray(np.ascontiguousarray(arr, dtype=np.float32)).resize(
+        (hash_size + 1, hash_size), Image.BOX)
+    pixels = np.asarray(small)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hamming_distances(hashes, value):
+    """向量化计算 hashes (uint64 数组) 与 value 的汉明距离。"""
+    import numpy as np
+
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def caption_namespace(model, prompt):
+    """描述只在相同模型和识图提示词之间复用。"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:32]
+
+
+def _to_signed(value):
+    # SQLite INTEGER 为有符号 64 位
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class _Namespace:
+    __slots__ = ("hashes", "captions", "array")
+
+    def __init__(self):
+        self.hashes = []
+        self.captions = []
+        self.array = None
+
+
+class CaptionIndex:
+    """
+    感知哈希 -> 图片描述 的持久化索引 (SQLite)。
+    每个命名空间首次查询时整体载入内存，之后的查找用 NumPy 向量化比较汉明距离。
+    """
+
+    def __init__(self, db_path=CAPTION_INDEX_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._namespaces = {}
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS captions ("
+                "namespace TEXT NOT NULL, hash INTEGER NOT NULL, caption TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, hash))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load_locked(self, namespace):
+        entry = self._namespaces.get(namespace)
+        if entry is None:
+            entry = self._namespaces[namespace] = _Namespace()
+            rows = self._connect().execute("SELECT hash, caption FROM captions WHERE namespace = ?", (namespace,))
+            for value, caption in rows:
+                entry.hashes.append(value & _HASH_MASK)
+                entry.captions.append(caption)
+        return entry
+
+    def lookup(self, namespace, value, max_distance):
+        """返回汉明距离不超过 max_distance 的最近描述，没有则返回 None。"""
+        import numpy as np
+
+        with self._lock:
+            entry = self._load_locked(namespace)
+            if not entry.hashes:
+                return None
+            if entry.array is None:
+                entry.array = np.fromiter(entry.hashes, dtype=np.uint64, count=len(entry.hashes))
+            array, captions = entry.array, entry.captions
+        distances = hamming_distances(array, value)
+        best = int(distances.argmin())
+        return captions[best] if distances[best] <= max_distance else None
+
+    def add(self, namespace, value, caption):
+        with self._lock:
+            entry = self._load_locked(namespace)
+            self._connect().execute(
+                "INSERT OR REPLACE INTO captions (namespace, hash, caption, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, _to_signed(value), caption, time.time()),
+            )
+            self._conn.commit()
+            if value in entry.hashes:
+                entry.captions[entry.hashes.index(value)] = caption
+            else:
+                entry.hashes.append(value)
+                entry.captions.append(caption)
+                entry.array = None
+
+    def clear(self, namespace=None):
+        """清除索引 (namespace 为空则清除全部)。"""
+        with self._lock:
+            conn = self._connect()
+            if namespace is None:
+                conn.execute("DELETE FROM captions")
+                self._namespaces.clear()
+            else:
+                conn.execute("DELETE FROM captions WHERE namespace = ?", (namespace,))
+                self._namespaces.pop(namespace, None)
+            conn.commit()
+
+
+_index_lock = threading.Lock()
+_indexes = {}
+
+
+def get_caption_index(db_path=CAPTION_INDEX_DB):
+    with _index_lock:
+        index = _indexes.get(db_path)
+        if index is None:
+            index = _indexes[db_path] = CaptionIndex(db_path)
+        return index
+
+
+def dedupe_frames(hashes, max_distance, lookup=None):
+    """
+    对一组帧哈希去重，返回 (sources, cached)：
+    sources[i] 为需要复用其描述的代表帧下标 (代表帧为自身)，cached[i] 为索引中已有的描述或 None。
+    lookup(hash) 用于查询持久化索引，命中的帧不再作为代表帧。
+    """
+    import numpy as np
+
+    sources = list(range(len(hashes)))
+    cached = [None] * len(hashes)
+    reps = np.empty(len(hashes), dtype=np.uint64)
+    rep_indices = []
+    for i, value in enumerate(hashes):
+        if lookup is not None:
+            cached[i] = lookup(value)
+            if cached[i] is not None:
+                continue
+        if rep_indices:
+            distances = hamming_distances(reps[:len(rep_indices)], value)
+            best = int(distances.argmin())
+            if distances[best] <= max_distance:
+                sources[i] = rep_indices[best]
+                continue
+        reps[len(rep_indices)] = value
+        rep_indices.append(i)
+    return sources, cached
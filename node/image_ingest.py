@@ -0,0 +1,194 @@
+import os
+import io
+import time
+import base64
+import binascii
+import threading
+from collections import OrderedDict
+
+from .image_codec import encode_pil
+
+# 远程图片下载上限 (字节)
+DEFAULT_MAX_DOWNLOAD_BYTES = int(os.getenv("GLM_IMAGE_MAX_DOWNLOAD_BYTES", str(20 * 1024 * 1024)))
+# 接口单张图片大小上限，超出时在本地重新编码
+API_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+# URL 图片缓存 (按字节数 LRU) 与有效期
+URL_CACHE_MAX_BYTES = int(os.getenv("GLM_URL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+URL_CACHE_TTL = float(os.getenv("GLM_URL_CACHE_TTL", "3600"))
+FETCH_TIMEOUT = float(os.getenv("GLM_IMAGE_FETCH_TIMEOUT", "30"))
+
+_CHUNK_SIZE = 64 * 1024
+
+# 文件头 -> MIME 类型
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+class ImageIngestError(ValueError):
+    """图片数据无效、格式不支持或超出大小限制。"""
+
+
+def sniff_mime(header):
+    """根据文件头识别图片类型，无法识别时返回 None。"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime in _SIGNATURES:
+        if header.startswith(signature):
+            return mime
+    return None
+
+
+def validate_base64_image(value, max_bytes=API_MAX_IMAGE_BYTES):
+    """
+    校验 Base64 图片 (可带 data URL 前缀)，只解码开头几十个字节识别格式，不解码整段数据。
+    返回 (data_url, 解码后字节数估算)；超过 max_bytes 时抛出 ImageIngestError。
+    """
+    payload = value.strip()
+    if payload.startswith("data:"):
+        _, _, payload = payload.partition(",")
+    # 与 b64decode 默认行为一致：允许换行等空白和缺省的 "=" 填充
+    payload = "".join(payload.split()).rstrip("=")
+    if not payload:
+        raise ImageIngestError("Base64 数据为空。")
+    if len(payload) % 4 == 1:
+        raise ImageIngestError("Base64 数据长度不正确 (可能被截断)。")
+    payload += "=" * (-len(payload) % 4)
+    try:
+        header = base64.b64decode(payload[:64], validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ImageIngestError(f"Base64 数据无效: {e}")
+    mime = sniff_mime(header)
+    if mime is None:
+        raise ImageIngestError("无法识别的图片格式 (支持 JPEG/PNG/WEBP/GIF/BMP)。")
+    nbytes = len(payload) * 3 // 4 - payload[-2:].count("=")
+    if max_bytes and nbytes > max_bytes:
+        raise ImageIngestError(f"图片约 {nbytes / 1024 / 1024:.1f} MB，超过上限 {max_bytes / 1024 / 1024:.1f} MB。")
+    return f"data:{mime};base64,{payload}", nbytes
+
+
+class _URLCache:
+    """URL 图片处理结果缓存：按总字节数 LRU 淘汰，超过有效期的条目视为未命中。"""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if self.ttl > 0 and time.monotonic() - entry[0] > self.ttl:
+                self._bytes -= len(entry[1])
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, data_url, nbytes):
+        if len(data_url) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._data[key] = (time.monotonic(), data_url, nbytes)
+            self._bytes += len(data_url)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted[1])
+
+
+_url_cache = _URLCache(URL_CACHE_MAX_BYTES, URL_CACHE_TTL)
+_client_lock = threading.Lock()
+_client = None
+
+
+def _http_client():
+    """共享的 httpx 客户端 (keep-alive 连接池)，首次使用时创建。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            _client = httpx.Client(
+                follow_redirects=True,
+                timeout=httpx.Timeout(FETCH_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return _client
+
+
+def fetch_url_bytes(url, max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES):
+    """流式下载 URL 内容，Content-Length 或累计字节数超过 max_bytes 时立即中止。"""
+    with _http_client().stream("GET", url) as response:
+        response.raise_for_status()
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and max_bytes and int(declared) > max_bytes:
+            raise ImageIngestError(f"远程图片 {int(declared) / 1024 / 1024:.1f} MB，超过下载上限 {max_bytes / 1024 / 1024:.1f} MB。")
+        buffer = io.BytesIO()
+        for chunk in response.iter_bytes(_CHUNK_SIZE):
+            buffer.write(chunk)
+            if max_bytes and buffer.tell() > max_bytes:
+                raise ImageIngestError(f"远程图片超过下载上限 {max_bytes / 1024 / 1024:.1f} MB。")
+        return buffer.getvalue()
+
+
+def prepare_image_bytes(data, max_edge=0, fmt="JPEG", quality=90):
+    """
+    将图片字节转为 data URL：格式受支持、尺寸和大小都在限制内时原样发送，
+    否则按 max_edge 缩小并重新编码。返回 (data_url, 字节数)。
+    """
+    from PIL import Image, ImageOps
+
+    mime = sniff_mime(data[:16])
+    if mime is None:
+        raise ImageIngestError("无法识别的图片格式。")
+    with Image.open(io.BytesIO(data)) as img:
+        oversized = max_edge and max(img.size) > max_edge
+        if mime in ("image/jpeg", "image/png", "image/webp") and not oversized and len(data) <= API_MAX_IMAGE_BYTES:
+            return f"data:{mime};base64," + base64.b64encode(data).decode("ascii"), len(data)
+        if oversized and img.format == "JPEG":
+            # JPEG 直接按缩小比例解码
+            img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if oversized:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+        encoded, encoded_mime = encode_pil(img, fmt, quality)
+    return f"data:{encoded_mime};base64," + base64.b64encode(encoded).decode("ascii"), len(encoded)
+
+
+def ingest_base64_image(value, max_edge=0, fmt="JPEG", quality=90, max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES):
+    """
+    处理 Base64 图片输入，返回 (data_url, 字节数, 是否重新编码)。
+    一般情况只校验文件头；超过接口单图上限时才完整解码并缩小重新编码。
+    """
+    data_url, nbytes = validate_base64_image(value, max_bytes)
+    if nbytes <= API_MAX_IMAGE_BYTES:
+        return data_url, nbytes, False
+    data = base64.b64decode(data_url.partition(",")[2])
+    data_url, nbytes = prepare_image_bytes(data, max_edge, fmt, quality)
+    return data_url, nbytes, True
+
+
+def ingest_image_url(url, max_edge=0, fmt="JPEG", quality=90, max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES, use_cache=True):
+    """下载 URL 图片并转为 data URL (结果缓存)，返回 (data_url, 字节数, 是否命中缓存)。"""
+    key = (url, max_edge, fmt, quality)
+    if use_cache:
+        cached = _url_cache.get(key)
+        if cached is not None:
+            return cached[0], cached[1], True
+    data = fetch_url_bytes(url, max_bytes)
+    data_url, nbytes = prepare_image_bytes(data, max_edge, fmt, quality)
+    if use_cache:
+        _url_cache.set(key, data_url, nbytes)
+    return data_url, nbytes, False
@@ -1,13 +1,108 @@
 import os
-from PIL import Image
-import numpy as np
+import glob
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL/numpy/torch 在首次加载图片时才导入，节点注册时不加载
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff')
+
+# 解码结果缓存上限 (字节)
+DECODE_CACHE_MAX_BYTES = int(os.getenv("GLM_IMAGE_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+class _DecodeCache:
+    """按 (路径, mtime, 大小, max_size) 缓存解码后的 uint8 数组，按总字节数 LRU 淘汰。"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            arr = self._data.get(key)
+            if arr is not None:
+                self._data.move_to_end(key)
+            return arr
+
+    def set(self, key, arr):
+        if arr.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._data[key] = arr
+            self._bytes += arr.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+
+_decode_cache = _DecodeCache(DECODE_CACHE_MAX_BYTES)
+
+
+def resolve_image_paths(image_path):
+    """
+    解析输入：每行一个路径，可以是文件、目录 (按文件名排序取其中的图片) 或 glob 通配符。
+    """
+    paths = []
+    for entry in image_path.splitlines():
+        entry = entry.strip().strip('"')
+        if not entry:
+            continue
+        if os.path.isdir(entry):
+            paths.extend(sorted(
+                os.path.join(entry, name) for name in os.listdir(entry)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            ))
+        elif any(ch in entry for ch in '*?['):
+            paths.extend(sorted(p for p in glob.glob(entry, recursive=True) if p.lower().endswith(IMAGE_EXTENSIONS)))
+        elif os.path.exists(entry):
+            paths.append(entry)
+        else:
+            raise FileNotFoundError(f"文件不存在: {entry}")
+    return paths
+
+
+def decode_image(path, max_size=0, use_cache=True):
+    """解码为 RGB uint8 数组；max_size > 0 时 JPEG 使用 draft 模式直接按缩小比例解码。"""
+    from PIL import Image, ImageOps
+    import numpy as np
+
+    key = None
+    if use_cache:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, max_size)
+        cached = _decode_cache.get(key)
+        if cached is not None:
+            return cached
+    with Image.open(path) as img:
+        if max_size and img.format == 'JPEG':
+            img.draft('RGB', (max_size, max_size))
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        if max_size and max(img.size) > max_size:
+            img.thumbnail((max_size, max_size), Image.LANCZOS)
+        arr = np.asarray(img)
+    if key is not None:
+        _decode_cache.set(key, arr)
+    return arr
+
 
 class LoadImageNode:
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "image_path": ("STRING", {"default": ""}),
+                "image_path": ("STRING", {"default": "", "multiline": True, "tooltip": "每行一个图片路径、目录或通配符 (如 D:/frames/*.png)"}),
+            },
+            "optional": {
+                "max_size": ("INT", {"default": 0, "min": 0, "max": 16384, "tooltip": "长边上限，0=原始尺寸"}),
+                "num_workers": ("INT", {"default": 8, "min": 1, "max": 64, "tooltip": "并行解码线程数"}),
+                "use_cache": ("BOOLEAN", {"default": True, "tooltip": "按路径和修改时间缓存解码结果"}),
             }
         }
 
@@ -16,13 +111,31 @@ class LoadImageNode:
     FUNCTION = "load_image_path"
     CATEGORY = "JFD/image"
 
-    def load_image_path(self, image_path):
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"文件不存在: {image_path}")
-        image = Image.open(image_path).convert("RGB")
-        image_np = np.array(image)
-        return (image_np, image_path)
+    def load_image_path(self, image_path, max_size=0, num_workers=8, use_cache=True):
+        from PIL import Image
+        import numpy as np
+        import torch
+
+        paths = resolve_image_paths(image_path)
+        if not paths:
+            raise FileNotFoundError(f"未找到图片: {image_path}")
+
+        # 第一张图片决定批次尺寸，批次张量只分配一次，各线程直接写入对应位置
+        first = decode_image(paths[0], max_size, use_cache)
+        height, width = first.shape[:2]
+        batch = torch.empty((len(paths), height, width, 3), dtype=torch.float32)
+        batch_np = batch.numpy()
+
+        def _load(index):
+            arr = first if index == 0 else decode_image(paths[index], max_size, use_cache)
+            if arr.shape[:2] != (height, width):
+                arr = np.asarray(Image.fromarray(arr).resize((width, height), Image.LANCZOS))
+            np.multiply(arr, 1.0 / 255.0, out=batch_np[index], casting='unsafe')
+
+        with ThreadPoolExecutor(max_workers=max(1, min(num_workers, len(paths)))) as executor:
+            list(executor.map(_load, range(len(paths))))
+        return (batch, "\n".join(paths))
 
 # NODE_CLASS_MAPPINGS = {
 #     "LoadImage": LoadImageNode
-# }
\ No newline at end of file
+# }
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from .glm_keys import get_api_key_usage
+
+# 设置后每条指标事件追加写入该 JSONL 文件
+METRICS_FILE = os.getenv("GLM_METRICS_FILE", "")
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = "glm_prompt_"
+
+# 耗时直方图分桶 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Histogram:
+    __slots__ = ("count", "sum", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class JsonlSink:
+    """将指标事件逐行写入 JSONL 文件 (每行一个事件，带时间戳)。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表：计数器 (调用次数/token/字节/缓存命中/重试) 与耗时直方图 (各阶段耗时)。
+    snapshot() 返回 JSON 可序列化的统计，render_prometheus() 输出 Prometheus 文本格式，
+    add_sink() 注册的 sink 会收到每条原始事件。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._sinks = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        with self._lock:
+            if sink in self._sinks:
+                self._sinks.remove(sink)
+
+    def _emit(self, kind, name, value, labels):
+        sinks = self._sinks
+        if not sinks:
+            return
+        event = {"ts": time.time(), "type": kind, "name": name, "value": value}
+        event.update((k, v) for k, v in labels.items() if v is not None)
+        for sink in list(sinks):
+            try:
+                sink.write(event)
+            except Exception:
+                # 指标输出失败不能影响节点执行
+                pass
+
+    def incr(self, name, value=1, **labels):
+        if not value:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+        self._emit("histogram", name, value, labels)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """记录代码块耗时到 stage_seconds{stage=...}，异常时额外带 status=error。"""
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - started, stage=stage, status=status, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self._counters.items()]
+            histograms = [dict(histogram.as_dict(), name=name, labels=dict(labels))
+                          for (name, labels), histogram in self._histograms.items()]
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self):
+        def _labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.buckets), h.count, h.sum) for key, h in histograms]
+        seen = set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for (name, labels), buckets, count, total in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
+if METRICS_FILE:
+    metrics.add_sink(JsonlSink(METRICS_FILE))
+
+
+def record_usage(usage, model=None):
+    """记录响应中的 token 用量 (prompt/completion/命中上下文缓存的 cached token)。"""
+    if usage is None:
+        return
+    metrics.incr("tokens_total", getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    metrics.incr("tokens_total", getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    metrics.incr("tokens_total", cached or 0, model=model, kind="cached")
+
+
+def get_metrics_snapshot():
+    return metrics.snapshot()
+
+
+def register_metrics_routes():
+    """
+    在 ComfyUI 服务上注册 /glm_prompt/metrics (Prometheus) 和 /glm_prompt/stats (JSON)，
+    stats 中的 api_keys 为各 Key (已脱敏) 的使用统计。
+    """
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return False
+    routes = PromptServer.instance.routes
+
+    @routes.get("/glm_prompt/metrics")
+    async def _prometheus(request):
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    @routes.get("/glm_prompt/stats")
+    async def _stats(request):
+        return web.json_response(dict(metrics.snapshot(), api_keys=get_api_key_usage()))
+
+    return True
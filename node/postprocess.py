@@ -0,0 +1,188 @@
+import re
+from functools import lru_cache
+
+from .glm_tokens import estimate_tokens, truncate_text
+from .metrics import metrics
+
+BOX_BEGIN = "<|begin_of_box|>"
+BOX_END = "<|end_of_box|>"
+
+# 解析阶段的内置规则：去掉推理过程 (GLM-z1-* / GLM-4.1v-thinking-* 的 <think>...</think>)、提取 box 内容
+RULE_STRIP_REASONING = "strip_reasoning"
+RULE_EXTRACT_BOX = "extract_box"
+DEFAULT_RULES = (RULE_STRIP_REASONING, RULE_EXTRACT_BOX)
+
+# 流式预览时末尾可能只收到这些标记的前缀
+MARKERS = ("<think>", "</think>", BOX_BEGIN, BOX_END, "<answer>", "</answer>")
+
+# 一次扫描识别全部标记：推理段 (允许未闭合)、box 段 (允许未闭合)、<answer> 标签、缺少开始标签的 </think>
+_PARSE_RE = re.compile(
+    r"(?P<think><think>.*?(?:</think>|\Z))"
+    r"|" + re.escape(BOX_BEGIN) + r"(?P<box>.*?)(?:" + re.escape(BOX_END) + r"|\Z)"
+    r"|(?P<answer></?answer>)"
+    r"|(?P<stray></think>)",
+    re.S,
+)
+
+_NEWLINES_RE = re.compile(r"\r\n?")
+_SPACES_RE = re.compile(r"[ \t　\xa0]+")
+_LINE_EDGE_RE = re.compile(r" *\n *")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" +([,.;:!?，。；：！？、])")
+_REPEATED_COMMA_RE = re.compile(r"([,，])(?:\s*[,，])+")
+_COMMA_SPACE_RE = re.compile(r",(?=[^\s\d])")
+_WRAPPING_QUOTES = {'"': '"', "'": "'", "“": "”", "「": "」", "《": "》"}
+_TAG_SPLIT_RE = re.compile(r"\s*[,，]\s*")
+_TRUNCATE_BOUNDARY_RE = re.compile(r".*[,，.。;；!！?？\n]", re.S)
+
+
+def parse_response(text, strip_reasoning=True, extract_box=True):
+    """
+    单次扫描解析模型输出：去掉推理段，存在 box 时只保留 box 内容 (多个 box 按行拼接)，
+    否则保留推理段以外的正文。
+    """
+    if not text:
+        return text or ""
+    body = []
+    boxes = []
+    position = 0
+    for match in _PARSE_RE.finditer(text):
+        body.append(text[position:match.start()])
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "think":
+            if not strip_reasoning:
+                body.append(match.group())
+        elif kind == "box":
+            if extract_box:
+                boxes.append(match.group("box").strip())
+            else:
+                body.append(match.group("box"))
+        elif kind == "stray" and strip_reasoning:
+            # 只有结束标签时，之前的内容都是推理过程
+            body.clear()
+            boxes.clear()
+        elif kind == "stray":
+            body.append(match.group())
+    body.append(text[position:])
+    if boxes:
+        return "\n".join(box for box in boxes if box)
+    return "".join(body).strip()
+
+
+def strip_partial_marker(text):
+    """去掉末尾可能是标记前缀的部分 (标记被拆分到多个流式分片时)。"""
+    index = text.rfind("<")
+    if index < 0:
+        return text
+    tail = text[index:]
+    if any(len(tail) < len(marker) and marker.startswith(tail) for marker in MARKERS):
+        return text[:index]
+    return text
+
+
+_RULES = {}
+
+
+def register_rule(name, fn=None):
+    """注册后处理规则 fn(text) -> text，可作为装饰器使用。"""
+    def _register(func):
+        _RULES[name] = func
+        return func
+    return _register(fn) if fn is not None else _register
+
+
+def available_rules():
+    return list(DEFAULT_RULES) + sorted(_RULES)
+
+
+@register_rule("normalize")
+def normalize_text(text):
+    """统一换行与空白，去掉标点前的空格、重复逗号和包裹整段的引号。"""
+    text = _NEWLINES_RE.sub("\n", text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _LINE_EDGE_RE.sub("\n", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+    text = _REPEATED_COMMA_RE.sub(r"\1", text)
+    text = _COMMA_SPACE_RE.sub(", ", text).strip()
+    if len(text) >= 2 and _WRAPPING_QUOTES.get(text[0]) == text[-1]:
+        text = text[1:-1].strip()
+    return text
+
+
+@register_rule("dedupe_tags")
+def dedupe_tags(text):
+    """逐行对逗号分隔的标签去重 (忽略大小写和多余空格)，保留首次出现的顺序。"""
+    lines = []
+    for line in text.split("\n"):
+        tags = _TAG_SPLIT_RE.split(line.strip())
+        if len(tags) < 2:
+            lines.append(line)
+            continue
+        separator = "，" if line.count("，") > line.count(",") else ", "
+        seen = {}
+        for tag in tags:
+            key = " ".join(tag.lower().split())
+            if key and key not in seen:
+                seen[key] = tag
+        lines.append(separator.join(seen.values()))
+    return "\n".join(lines)
+
+
+def truncate_prompt(text, max_tokens):
+    """截断到 max_tokens 以内，尽量在最后一个标点处断开。"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    truncated = truncate_text(text, max_tokens)
+    boundary = _TRUNCATE_BOUNDARY_RE.match(truncated)
+    if boundary and boundary.end() >= len(truncated) // 2:
+        truncated = truncated[:boundary.end()]
+    return truncated.rstrip(" ,，、;；\n")
+
+
+class PostProcessor:
+    """
+    模型输出后处理：先单次扫描完成 strip_reasoning/extract_box，再依次执行注册的清理规则，
+    最后按 max_tokens 截断。process_many() 对整个列表逐规则处理，批量与流式输出共用；
+    接口返回和缓存中保存的都是原始文本，只在输出前处理一次。
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, max_tokens=0):
+        unknown = [name for name in rules if name not in DEFAULT_RULES and name not in _RULES]
+        if unknown:
+            raise ValueError(f"未知的后处理规则: {', '.join(unknown)} (可用: {', '.join(available_rules())})")
+        self.rules = tuple(rules)
+        self.max_tokens = max_tokens
+        self._strip_reasoning = RULE_STRIP_REASONING in rules
+        self._extract_box = RULE_EXTRACT_BOX in rules
+        self._steps = [_RULES[name] for name in rules if name in _RULES]
+
+    def process_many(self, texts):
+        with metrics.timer("parse"):
+            return self.apply(texts)
+
+    def apply(self, texts):
+        """同 process_many，但不记录耗时指标 (流式预览会高频调用)。"""
+        texts = [parse_response(text, self._strip_reasoning, self._extract_box) if text else (text or "")
+                 for text in texts]
+        for step in self._steps:
+            texts = [step(text) if text else text for text in texts]
+        if self.max_tokens > 0:
+            texts = [truncate_prompt(text, self.max_tokens) for text in texts]
+        return texts
+
+    def process(self, text):
+        return self.process_many([text])[0]
+
+
+def parse_rules(value):
+    """将节点上逗号分隔的规则名转为元组，内置解析规则始终启用。"""
+    names = [name.strip() for name in (value or "").replace("\n", ",").split(",")]
+    return tuple(dict.fromkeys(list(DEFAULT_RULES) + [name for name in names if name]))
+
+
+@lru_cache(maxsize=64)
+def get_postprocessor(rules=DEFAULT_RULES, max_tokens=0):
+    """按 (规则, max_tokens) 复用 PostProcessor 实例。"""
+    return PostProcessor(rules, max_tokens)
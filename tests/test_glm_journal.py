@@ -0,0 +1,42 @@
+import os
+import json
+import importlib.util
+
+import pytest
+
+_MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "node", "glm_journal.py")
+
+
+@pytest.fixture(scope="module")
+def glm_journal():
+    # glm_journal 只依赖标准库，直接按文件加载，不触发节点包的导入
+    spec = importlib.util.spec_from_file_location("glm_journal", _MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _complete_line(key, result):
+    return json.dumps({"key": key, "status": "ok", "latency": 0.1, "result": result}, ensure_ascii=False) + "\n"
+
+
+# 崩溃截断的最后一行：截断在最后一个汉字中间 / 恰好在完整汉字之后
+@pytest.mark.parametrize("cut", [1, 0], ids=["mid_character", "after_character"])
+def test_torn_cjk_line_is_skipped_and_appends_resume(tmp_path, glm_journal, cut):
+    path = tmp_path / "journal.jsonl"
+    torn = '{"key": "k2", "status": "ok", "result": "一只猫'.encode("utf-8")
+    torn = torn[:len(torn) - cut]
+    path.write_bytes(_complete_line("k1", "红色的花").encode("utf-8") + torn)
+
+    journal = glm_journal.JobJournal(str(path))
+    assert journal.get("k1") == "红色的花"
+    assert journal.get("k2") is None
+
+    result, resumed = glm_journal.journaled_call(journal, "k2", lambda: "一只猫", node="test")
+    assert (result, resumed) == ("一只猫", False)
+    journal.close()
+
+    reloaded = glm_journal.JobJournal(str(path))
+    assert reloaded.get("k1") == "红色的花"
+    assert reloaded.get("k2") == "一只猫"
+    assert [r["key"] for r in reloaded.query()] == ["k1", "k2"]